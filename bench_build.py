@@ -0,0 +1,336 @@
+"""
+Benchmark suite for deck building.
+
+Times the slide helpers (chunk_content, split_code_into_chunks,
+fit_content_chunks, fit_code_chunks, plan_slides, add_bulleted_paragraph,
+replace_placeholders, duplicate_slide) and end-to-end build_ppt on the
+bundled slides.json and on synthetic 10/100/1000-slide decks with different
+content/code/image mixes, for every template_iamneo*.pptx.
+Images are served by a local HTTP stub so runs don't depend on the network,
+and the image and slide caches are disabled so every run does the same work.
+
+Results are written as JSON (bench_results.json is git-ignored); pass
+--baseline to compare against an earlier run and flag cases that got
+slower than --threshold (exit code 1).
+
+    python bench_build.py [--repeat 3] [--sizes 10,100,1000] [--output bench_results.json]
+                          [--baseline old.json] [--threshold 0.15] [--api-url http://localhost:8000]
+"""
+import os
+
+# Must be set before pptgenerator imports the image and slide caches
+os.environ.setdefault("IMAGE_CACHE_ENABLED", "0")
+os.environ.setdefault("SLIDE_CACHE_ENABLED", "0")
+
+import argparse
+import glob
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from copy import deepcopy
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import requests
+from PIL import Image
+from pptx import Presentation
+
+from pptgenerator import (
+    add_bulleted_paragraph,
+    build_ppt_to_stream,
+    chunk_content,
+    duplicate_slide,
+    fit_code_chunks,
+    fit_content_chunks,
+    plan_slides,
+    replace_placeholders,
+    split_code_into_chunks,
+)
+
+MIXES = {
+    "content": {"code": 0.0, "image": 0.0},
+    "code": {"code": 1.0, "image": 0.0},
+    "image": {"code": 0.0, "image": 1.0},
+    "mixed": {"code": 0.35, "image": 0.35},
+}
+STUB_IMAGE_VARIANTS = 24
+
+
+# ------------------ Image Stub ------------------ #
+def make_stub_images():
+    """A few photo-like JPEGs and flat PNGs, large enough to be downscaled."""
+    rng = random.Random(7)
+    gradient = Image.linear_gradient("L").resize((1280, 960))
+    images = {}
+    for n in range(STUB_IMAGE_VARIANTS):
+        noise = Image.effect_noise((1280, 960), 10 + n)
+        img = Image.merge("RGB", (gradient, Image.blend(gradient, noise, 0.3), noise))
+        out = BytesIO()
+        if n % 3 == 0:
+            img = Image.new("RGB", (1400, 900), tuple(rng.randrange(256) for _ in range(3)))
+            img.save(out, format="PNG")
+            images[f"/img/{n}.png"] = (out.getvalue(), "image/png")
+        else:
+            img.save(out, format="JPEG", quality=90)
+            images[f"/img/{n}.jpg"] = (out.getvalue(), "image/jpeg")
+    return images
+
+
+def start_image_stub():
+    """Serve make_stub_images() on 127.0.0.1; returns (server, list of image URLs)."""
+    images = make_stub_images()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path not in images:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body, content_type = images[path]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, [base + path for path in images]
+
+
+# ------------------ Synthetic Decks ------------------ #
+def synthetic_deck(slide_count, mix, image_urls, seed=0):
+    """A deck of slide_count content slides; code/image shares come from MIXES[mix]."""
+    rng = random.Random(f"{seed}-{slide_count}-{mix}")
+    words = ("deck slide **build** render *layout* python template image bullet "
+             "placeholder stream **cache** pool worker code").split()
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    deck = [{"title": f"Synthetic {mix} deck ({slide_count} slides)"}]
+    for i in range(1, slide_count):
+        slide = {
+            "title": f"Slide {i}: {sentence(4)}",
+            "content": [
+                {"text": sentence(rng.randint(12, 30)),
+                 "subpoints": [sentence(rng.randint(4, 10)) for _ in range(rng.randint(0, 4))]}
+                for _ in range(rng.randint(3, 6))
+            ],
+            "notes": sentence(25),
+        }
+        if rng.random() < MIXES[mix]["code"]:
+            lines = [f"def step_{i}_{n}(value):\n    return value * {n}" for n in range(rng.randint(5, 30))]
+            slide["code"] = {"title": f"Example {i}", "snippet": "\n".join(lines)}
+        if rng.random() < MIXES[mix]["image"]:
+            # Unique query string per slide so prefetch dedup doesn't hide fetches
+            slide["image_url"] = f"{rng.choice(image_urls)}?slide={i}"
+        deck.append(slide)
+    return deck
+
+
+def bundled_deck():
+    with open("slides.json", encoding="utf-8") as f:
+        return json.load(f)["slides"]
+
+
+# ------------------ Timing ------------------ #
+def measure(fn, repeat):
+    """
+    Run fn() repeat times. fn may return a dict with "elapsed" to time only
+    part of its work (setup excluded) plus extra fields to keep in the result.
+    """
+    times = []
+    extra = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        if isinstance(out, dict):
+            extra = dict(out)
+            elapsed = extra.pop("elapsed", elapsed)
+        times.append(elapsed)
+    return {"repeat": repeat, "best_s": min(times), "median_s": statistics.median(times), **extra}
+
+
+def bench_helpers(template_path, repeat):
+    results = {}
+    deck = bundled_deck()
+    content = [item for slide in deck for item in slide.get("content", [])] * 20
+    code = "\n".join(f"    line_{n} = compute({n})" for n in range(2000))
+
+    results["chunk_content"] = measure(lambda: chunk_content(content, max_chars=600), repeat)
+    results["split_code_into_chunks"] = measure(lambda: split_code_into_chunks(code, max_lines=25), repeat)
+    results["fit_content_chunks"] = measure(lambda: fit_content_chunks(content), repeat)
+    results["fit_code_chunks"] = measure(lambda: fit_code_chunks(code), repeat)
+    results["plan_slides"] = measure(lambda: plan_slides(deck * 20), repeat)
+
+    texts = [item["text"] for item in content if isinstance(item, dict)][:500]
+
+    def bullets():
+        prs = Presentation(template_path)
+        tf = next(s for s in prs.slides[1].shapes if s.has_text_frame).text_frame
+        start = time.perf_counter()
+        for n, text in enumerate(texts):
+            add_bulleted_paragraph(tf, text, level=n % 2)
+        return {"elapsed": time.perf_counter() - start, "bullets": len(texts)}
+
+    results["add_bulleted_paragraph"] = measure(bullets, repeat)
+
+    def duplicate():
+        prs = Presentation(template_path)
+        start = time.perf_counter()
+        for _ in range(200):
+            duplicate_slide(prs, prs.slides[1])
+        return {"elapsed": time.perf_counter() - start, "slides": 200}
+
+    results["duplicate_slide"] = measure(duplicate, repeat)
+
+    content_slides = [s for s in deck if s.get("content")]
+
+    def fill():
+        prs = Presentation(template_path)
+        slides = [duplicate_slide(prs, prs.slides[1]) for _ in content_slides * 10]
+        start = time.perf_counter()
+        for slide, data in zip(slides, content_slides * 10):
+            data = dict(data, code="")
+            data.pop("image_url", None)
+            replace_placeholders(slide, data)
+        return {"elapsed": time.perf_counter() - start, "slides": len(slides)}
+
+    results["replace_placeholders"] = measure(fill, repeat)
+    return results
+
+
+def bench_builds(template_path, sizes, image_urls, repeat):
+    results = {}
+    decks = {"bundled": bundled_deck()}
+    for size in sizes:
+        for mix in MIXES:
+            decks[f"{mix}_{size}"] = synthetic_deck(size, mix, image_urls)
+
+    for name, deck in decks.items():
+        def build():
+            result = build_ppt_to_stream(template_path, deepcopy(deck))
+            return {"slides": result["slides_count"], "size_bytes": result["size_bytes"],
+                    "images": result["image_report"]["images"], "timings": result["timings"]}
+
+        # 1000-slide decks take seconds each; one run is enough to spot a regression
+        runs = repeat if len(deck) < 1000 else 1
+        results[f"build_ppt/{name}"] = measure(build, runs)
+        print(f"  {name:<16}{results[f'build_ppt/{name}']['median_s'] * 1000:>10.1f} ms")
+    return results
+
+
+def bench_api(api_url, sizes, image_urls, repeat):
+    """End-to-end POST /generate-ppt/ against a running server (includes the GridFS upload)."""
+    results = {}
+    session = requests.Session()
+    for size in sizes:
+        deck = synthetic_deck(size, "mixed", image_urls)
+
+        def post():
+            response = session.post(f"{api_url}/generate-ppt/", json=deck, timeout=600)
+            response.raise_for_status()
+            return {"slides": response.json()["slides_count"]}
+
+        results[f"api/generate-ppt/mixed_{size}"] = measure(post, repeat if size < 1000 else 1)
+    return results
+
+
+# ------------------ Comparison ------------------ #
+def compare(results, baseline, threshold):
+    """Cases whose median got slower than baseline by more than threshold."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["median_s"]:
+            continue
+        ratio = current["median_s"] / before["median_s"]
+        current["baseline_median_s"] = before["median_s"]
+        current["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--templates", default="template_iamneo*.pptx", help="glob of templates to build with")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+    parser.add_argument("--api-url", help="also benchmark POST /generate-ppt/ on a running server")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    server, image_urls = start_image_stub()
+    results = {}
+    try:
+        for template_path in sorted(glob.glob(args.templates)):
+            print(f"📄 {template_path}")
+            for name, result in bench_helpers(template_path, args.repeat).items():
+                results[f"{template_path}/{name}"] = result
+            for name, result in bench_builds(template_path, sizes, image_urls, args.repeat).items():
+                results[f"{template_path}/{name}"] = result
+        if args.api_url:
+            results.update(bench_api(args.api_url, sizes, image_urls, args.repeat))
+    finally:
+        server.shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["regressions"] = [{"name": name, "ratio": round(ratio, 3)} for name, ratio in regressions]
+
+    print(f"\n{'case':<56}{'median ms':>11}{'best ms':>10}{'vs base':>9}")
+    for name, result in results.items():
+        ratio = f"{result['ratio']:.2f}x" if "ratio" in result else ""
+        print(f"{name:<56}{result['median_s'] * 1000:>11.2f}{result['best_s'] * 1000:>10.2f}{ratio:>9}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if regressions:
+        for name, ratio in regressions:
+            print(f"🐢 Regression: {name} is {ratio:.2f}x the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: extract_json_array vs the old regex + demjson3 pipeline.
+
+Runs both parsers on recorded LLM outputs (debug_slides_json.txt, slides.json)
+wrapped the way models actually return them (prose, ```json fences, trailing
+commas, stray backslashes), scaled up to the 10-50 KB payloads seen in
+production, and checks both produce the same slides.
+
+    python bench_llm_json.py [--repeat 5]
+"""
+import argparse
+import json
+import re
+import time
+
+import demjson3
+
+from llm_json import extract_json_array
+
+
+def legacy_parse(ai_content):
+    """The parser previously inlined in call_groq_ai_system / call_gemini_ai_system."""
+    match = re.search(r"(\[.*\])", ai_content, re.S)
+    json_str = match.group(1)
+    json_str = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', json_str)
+    json_str = re.sub(r',(\s*[\]\}])', r'\1', json_str)
+    return demjson3.decode(json_str)
+
+
+def load_recorded_slides():
+    samples = {}
+    with open("debug_slides_json.txt", encoding="utf-8") as f:
+        samples["debug_slides_json"] = json.load(f)
+    with open("slides.json", encoding="utf-8") as f:
+        samples["slides_json"] = json.load(f)["slides"]
+    return samples
+
+
+def as_llm_output(slides, copies=1, dirty=False):
+    """Render slides the way an LLM returns them, optionally with the usual mistakes."""
+    deck = slides[:1] + slides[1:] * copies
+    text = json.dumps(deck, indent=2)
+    if dirty:
+        text = text.replace("}\n  ]", "},\n  ]")              # trailing commas
+        text = text.replace('"notes": "', '"notes": "See C:\\data\\x ')  # stray backslashes
+    return "Here is your presentation:\n```json\n" + text + "\n```\nLet me know if you need changes."
+
+
+def timed(fn, payload, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'sample':<32}{'size KB':>9}{'demjson3 ms':>13}{'new ms':>9}{'speedup':>9}  same")
+    for name, slides in load_recorded_slides().items():
+        for copies in (1, 4, 10):
+            for dirty in (False, True):
+                payload = as_llm_output(slides, copies, dirty)
+                old_t, old = timed(legacy_parse, payload, args.repeat)
+                new_t, new = timed(extract_json_array, payload, args.repeat)
+                label = f"{name} x{copies}{' dirty' if dirty else ''}"
+                print(f"{label:<32}{len(payload) / 1024:>9.1f}{old_t * 1000:>13.1f}{new_t * 1000:>9.2f}"
+                      f"{old_t / new_t:>8.0f}x  {old == new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+# ------------------ Build Pool Settings ------------------ #
+# Number of worker processes for deck builds; 0 runs builds in the calling thread.
+PPT_BUILD_PROCESSES = int(os.getenv("PPT_BUILD_PROCESSES", str(os.cpu_count() or 1)))
+PRELOAD_TEMPLATES = ["template_iamneo.pptx"]
+WARM_TIMEOUT = 60  # seconds to wait for every worker to start
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_manager = None
+_lock = threading.Lock()
+
+
+def _init_worker(template_paths):
+    from template_cache import preload_templates
+    preload_templates(template_paths)
+
+
+def _ping(barrier=None):
+    """Warm-up task; waiting on the barrier keeps this worker busy until every worker holds one."""
+    if barrier is not None:
+        try:
+            barrier.wait(WARM_TIMEOUT)
+        except Exception:
+            pass   # a worker failed to start; report the ones that did
+    return os.getpid()
+
+
+def _build_in_worker(template_path, slides_json, progress_queue=None):
+    """Runs in a worker process: slide JSON in, finished deck bytes out."""
+    from pptgenerator import build_ppt_to_stream
+
+    progress = None
+    if progress_queue is not None:
+        progress = lambda stage, percent: progress_queue.put((stage, percent))
+    result = build_ppt_to_stream(template_path, slides_json, progress=progress)
+    result["data"] = result.pop("stream").getvalue()
+    return result
+
+
+def _update_in_worker(template_path, deck, render_state, slides_json):
+    """Runs in a worker process: stored deck + edited slide JSON in, rebuilt deck bytes out."""
+    from pptgenerator import update_ppt_stream
+
+    result = update_ppt_stream(template_path, deck, render_state, slides_json)
+    result["data"] = result.pop("stream").getvalue()
+    return result
+
+
+def get_build_pool():
+    """The shared process pool, created on first use (None when disabled)."""
+    global _pool
+    if PPT_BUILD_PROCESSES <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # spawn: forking a process that already runs Mongo/HTTP threads is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=PPT_BUILD_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(PRELOAD_TEMPLATES,),
+            )
+        return _pool
+
+
+def _drop_broken_pool(pool):
+    """Forget a pool whose worker died, so later builds get a fresh one."""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    logger.warning("Build pool broken by a worker crash; it is recreated for the next build")
+
+
+def _submit(fn, *args):
+    """Submit to the pool; one already broken by an earlier worker crash is replaced first."""
+    pool = get_build_pool()
+    try:
+        return pool, pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        pool = get_build_pool()
+        return pool, pool.submit(fn, *args)
+
+
+def _result(pool, future):
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        raise
+
+
+async def _result_async(pool, future):
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        raise
+
+
+def _get_manager():
+    global _manager
+    with _lock:
+        if _manager is None:
+            _manager = multiprocessing.get_context("spawn").Manager()
+        return _manager
+
+
+def warm_build_pool():
+    """
+    Start every worker now so they load templates before the first request.
+    The pool spawns workers on demand, so each ping waits on a barrier until
+    all PPT_BUILD_PROCESSES of them are running one.
+    """
+    if get_build_pool() is None:
+        return 0
+    barrier = _get_manager().Barrier(PPT_BUILD_PROCESSES)
+    pings = [_submit(_ping, barrier) for _ in range(PPT_BUILD_PROCESSES)]
+    pids = {_result(pool, future) for pool, future in pings}
+    logger.info("Build pool ready: %d worker processes", len(pids))
+    return len(pids)
+
+
+def _as_stream_result(result):
+    result["stream"] = BytesIO(result.pop("data"))
+    return result
+
+
+def build_ppt_in_pool(template_path, slides_json, progress=None):
+    """
+    Build a deck on the process pool and wait for it.
+    Same return value as pptgenerator.build_ppt_to_stream; progress callbacks
+    from the worker are relayed to `progress` in this process.
+    """
+    pool = get_build_pool()
+    if pool is None:
+        from pptgenerator import build_ppt_to_stream
+        return build_ppt_to_stream(template_path, slides_json, progress=progress)
+
+    if progress is None:
+        return _as_stream_result(_result(*_submit(_build_in_worker, template_path, slides_json)))
+
+    progress_queue = _get_manager().Queue()
+    pool, future = _submit(_build_in_worker, template_path, slides_json, progress_queue)
+    while True:
+        try:
+            progress(*progress_queue.get(timeout=0.2))
+        except queue.Empty:
+            if future.done():
+                break
+    return _as_stream_result(_result(pool, future))
+
+
+async def build_ppt_in_pool_async(template_path, slides_json):
+    """Await a pool build from async code without tying up the threadpool."""
+    pool = get_build_pool()
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        from pptgenerator import build_ppt_to_stream
+        return await loop.run_in_executor(None, build_ppt_to_stream, template_path, slides_json)
+    return _as_stream_result(await _result_async(*_submit(_build_in_worker, template_path, slides_json)))
+
+
+async def update_ppt_in_pool_async(template_path, deck, render_state, slides_json):
+    """Incremental rebuild (pptgenerator.update_ppt_stream) on the process pool."""
+    pool = get_build_pool()
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        from pptgenerator import update_ppt_stream
+        return await loop.run_in_executor(None, update_ppt_stream, template_path, deck, render_state, slides_json)
+    return _as_stream_result(
+        await _result_async(*_submit(_update_in_worker, template_path, deck, render_state, slides_json))
+    )
+
+
+def shutdown_build_pool():
+    global _pool, _manager
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
@@ -0,0 +1,183 @@
+"""
+Offline bulk deck builder.
+
+Builds every deck in a directory of *.json files or a JSONL file (one deck
+per line) across N worker processes, each with the template preloaded.
+Decks are written to --output-dir or uploaded to GridFS (--gridfs).
+Finished decks are appended to a manifest, so a rerun after a crash skips
+them (--force rebuilds everything). Prints decks/sec, slides/sec and
+p50/p95 build times at the end.
+
+Accepted deck formats: a list of slides, or {"slides": [...]} like
+slides.json. JSONL lines may carry an "id" (or "name") used for the output
+file name; otherwise the line number is used.
+
+    python bulk_build.py decks/ --output-dir out/ [--workers 8] [--template template_iamneo.pptx]
+    python bulk_build.py decks.jsonl --gridfs [--manifest decks.manifest.jsonl]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from build_pool import _init_worker
+
+
+# ------------------ Input ------------------ #
+def _slides_of(deck):
+    return deck["slides"] if isinstance(deck, dict) else deck
+
+
+def safe_deck_id(deck_id):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(deck_id)) or "deck"
+
+
+def iter_decks(input_path):
+    """Yield (deck_id, slides_json) from a directory of .json files or a .jsonl file."""
+    path = Path(input_path)
+    if path.is_dir():
+        for file in sorted(path.glob("*.json")):
+            with open(file, encoding="utf-8") as f:
+                yield safe_deck_id(file.stem), _slides_of(json.load(f))
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            deck = json.loads(line)
+            deck_id = deck.get("id") or deck.get("name") if isinstance(deck, dict) else None
+            yield safe_deck_id(deck_id or f"{path.stem}_{line_no}"), _slides_of(deck)
+
+
+# ------------------ Manifest ------------------ #
+def load_manifest(manifest_path):
+    """deck_id -> result of every deck finished by earlier runs."""
+    done = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # torn last line from a crash
+                if entry.get("status") == "done":
+                    done[entry["id"]] = entry
+    return done
+
+
+# ------------------ Worker ------------------ #
+def _build_deck(deck_id, slides_json, template_path, output_dir, to_gridfs):
+    """Runs in a worker process: build one deck and write or upload it."""
+    from pptgenerator import build_ppt_to_stream
+
+    start = time.perf_counter()
+    result = build_ppt_to_stream(template_path, slides_json)
+    entry = {
+        "id": deck_id,
+        "status": "done",
+        "slides": result["slides_count"],
+        "size_bytes": result["size_bytes"],
+        "build_seconds": round(time.perf_counter() - start, 4),
+    }
+
+    if to_gridfs:
+        from storage import store_ppt_in_mongodb
+        ppt_id = store_ppt_in_mongodb(result["stream"], f"{deck_id}.pptx", render_state=result["render_state"])
+        entry["ppt_id"] = str(ppt_id)
+    else:
+        output_path = os.path.join(output_dir, f"{deck_id}.pptx")
+        # Write then rename, so a crash never leaves a half-written deck behind
+        tmp_path = output_path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(result["stream"].getbuffer())
+        os.replace(tmp_path, output_path)
+        entry["output"] = output_path
+    entry["total_seconds"] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+# ------------------ Report ------------------ #
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def print_report(results, failures, skipped, wall_seconds):
+    built = len(results)
+    slides = sum(r["slides"] for r in results)
+    print(f"\n📦 Built {built} decks ({slides} slides) in {wall_seconds:.1f} s; "
+          f"{skipped} already done, {len(failures)} failed")
+    if built:
+        build_times = [r["build_seconds"] for r in results]
+        print(f"🚀 {built / wall_seconds:.2f} decks/sec, {slides / wall_seconds:.1f} slides/sec")
+        print(f"⏱️ Build time p50 {percentile(build_times, 50) * 1000:.0f} ms, "
+              f"p95 {percentile(build_times, 95) * 1000:.0f} ms, max {max(build_times) * 1000:.0f} ms")
+    for deck_id, error in failures:
+        print(f"⚠️ {deck_id}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="directory of *.json decks or a .jsonl file")
+    parser.add_argument("--template", default="template_iamneo.pptx")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output-dir", help="write <deck id>.pptx files here")
+    target.add_argument("--gridfs", action="store_true", help="upload decks to MongoDB GridFS")
+    parser.add_argument("--manifest", help="progress file used to resume (default: next to the output)")
+    parser.add_argument("--force", action="store_true", help="rebuild decks the manifest marks as done")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = args.manifest or (
+        os.path.join(args.output_dir, ".bulk_manifest.jsonl") if args.output_dir
+        else f"{Path(args.input).with_suffix('')}.manifest.jsonl"
+    )
+    done = {} if args.force else load_manifest(manifest_path)
+
+    results, failures = [], []
+    skipped = 0
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=([args.template],),
+    )
+    with pool, open(manifest_path, "a", encoding="utf-8") as manifest:
+        futures = {}
+        for deck_id, slides_json in iter_decks(args.input):
+            if deck_id in done:
+                skipped += 1
+                continue
+            future = pool.submit(_build_deck, deck_id, slides_json, args.template, args.output_dir, args.gridfs)
+            futures[future] = deck_id
+        print(f"🏭 Building {len(futures)} decks on {args.workers} workers ({skipped} already done)")
+
+        for future in as_completed(futures):
+            deck_id = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                failures.append((deck_id, str(e)))
+                entry = {"id": deck_id, "status": "failed", "error": str(e)}
+            else:
+                results.append(entry)
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+
+    print_report(results, failures, skipped, time.perf_counter() - start)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
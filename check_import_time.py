@@ -0,0 +1,78 @@
+"""
+Import-time budget check for the API module.
+
+Imports ppt_generator_api in fresh interpreters (python -X importtime) and
+fails if the best cumulative import time is over the budget, or if any of
+the lazily initialized dependencies (provider SDKs, MongoDB driver, Selenium,
+python-pptx) got imported at module level again.
+
+    python check_import_time.py [--budget-ms 800] [--runs 5]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+MODULE = "ppt_generator_api"
+# Must only be imported on first use (see the service registry in ppt_generator_api)
+LAZY_MODULES = ["google.generativeai", "groq", "pymongo", "gridfs", "selenium", "demjson3", "pptx", "storage", "googlesrapping"]
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "800"))
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("PPT_BUILD_PROCESSES", "0")
+    return env
+
+
+def measure_import_ms(module):
+    """Cumulative import time of `module` in a fresh interpreter, in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    match = re.search(rf"^import time:\s+\d+ \|\s+(\d+) \| {re.escape(module)}$", result.stderr, re.M)
+    return int(match.group(1)) / 1000
+
+
+def eagerly_imported(module):
+    """LAZY_MODULES already present in sys.modules right after importing `module`."""
+    code = (
+        f"import sys, {module}\n"
+        f"print('\\n'.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_env())
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    timings = [measure_import_ms(MODULE) for _ in range(args.runs)]
+    best = min(timings)
+    eager = eagerly_imported(MODULE)
+
+    print(f"⏱️ import {MODULE}: best {best:.0f} ms, median {sorted(timings)[len(timings) // 2]:.0f} ms "
+          f"(budget {args.budget_ms:.0f} ms)")
+    ok = True
+    if best > args.budget_ms:
+        print(f"🚫 Import time over budget by {best - args.budget_ms:.0f} ms")
+        ok = False
+    if eager:
+        print(f"🚫 Imported at module level but should be lazy: {', '.join(eager)}")
+        ok = False
+    if ok:
+        print("✅ Startup within budget")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
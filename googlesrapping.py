@@ -1,123 +1,245 @@
-# from selenium import webdriver
-# from selenium.webdriver.chrome.options import Options
-# from bs4 import BeautifulSoup
-# import time
-
-# def scrape_google_images(query, num_images=10):
-#     options = Options()
-#     options.add_argument("--headless")
-#     options.add_argument("--disable-gpu")
-#     options.add_argument("--no-sandbox")
-
-#     driver = webdriver.Chrome(options=options)
-#     search_url = f"https://www.google.com/search?tbm=isch&q={query}"
-#     print(f"Scraping URL: {search_url}")
-#     driver.get(search_url)
-
-#     # Scroll down to load images
-#     for _ in range(3):
-#         driver.execute_script("window.scrollBy(0, document.body.scrollHeight);")
-#         time.sleep(2)
-
-#     soup = BeautifulSoup(driver.page_source, "html.parser")
-#     with open("debug_google_images.html", "w", encoding="utf-8") as f:
-#         f.write(soup.prettify())
-#     driver.quit()
-
-#     image_urls = []
-#     for img_tag in soup.find_all("img"):
-#         src = img_tag.get("src")
-#         if src and src.startswith("data:"):
-#             is_valid = is_valid_image(src)
-#             if is_valid:
-#                 image_urls.append(src)
-#                 print("Found valid image")
-#             else:
-#                 print(f"Image too small or invalid")
-#         if len(image_urls) >= num_images:
-#             break
-
-#     return image_urls
-
-# # create function to read the imageurl and check it is valid by checking the size 400 x 400
-# def is_valid_image(url):
-#     try:
-#         from PIL import Image
-#         from io import BytesIO
-#         import base64
-
-#         header, encoded = url.split(",", 1)
-#         data = base64.b64decode(encoded)
-#         image = Image.open(BytesIO(data))
-#         width, height = image.size
-#         print(f"Image size: {width}x{height}")
-#         return width >= 200 and height >= 100
-#     except Exception as e:
-#         print(f"Error validating image: {e}")
-#         return False
-
-
-# # Example usage
-# images = scrape_google_images("ai-nlp-presentation-workflow-diagram", num_images=100)
-# for url in images:
-#     with open("debug_image_urls.txt", "a", encoding="utf-8") as f:
-#          f.write(url + "\n")
-#     # print(url)
-
-
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import logging
+import os
+import threading
 import time
 import re
 import urllib.parse
 
-def scrape_google_images(query, num_images=5):
+logger = logging.getLogger(__name__)
+
+# ------------------ Scraper Settings ------------------ #
+SCRAPER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "3"))
+SCRAPER_MAX_USES = int(os.getenv("SCRAPER_MAX_USES", "50"))           # recycle a browser after N queries
+SCRAPER_BREAKER_THRESHOLD = int(os.getenv("SCRAPER_BREAKER_THRESHOLD", "3"))
+SCRAPER_BREAKER_RESET = float(os.getenv("SCRAPER_BREAKER_RESET", "300"))  # seconds
+
+THUMBNAIL_SELECTOR = "h3.ob5Hkd img.YQ4gaf"
+PREVIEW_SELECTOR = "img.iPVvYb"
+IMAGE_EXT_RE = re.compile(r"\.(jpg|jpeg|png|gif|webp)", re.IGNORECASE)
+
+
+def _new_driver():
     options = Options()
     options.add_argument("--headless")  # keep visible for debugging
     options.add_argument("--disable-gpu")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--no-sandbox")
+    return webdriver.Chrome(options=options)
+
+
+class ChromePool:
+    """
+    Pool of long-lived headless Chrome sessions.
+    Browsers are recycled after SCRAPER_MAX_USES queries, and replaced right
+    away when a WebDriver call fails (crashed or hung browser).
+    """
+
+    def __init__(self, size=SCRAPER_POOL_SIZE, max_uses=SCRAPER_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = deque()
+        self._created = 0
+        # Guards _idle and _created; notified whenever a browser is returned or a slot frees up
+        self._cond = threading.Condition()
+
+    def _start(self):
+        """A new browser for a slot already counted in _created; the slot is given back if Chrome fails to start."""
+        try:
+            return {"driver": _new_driver(), "uses": 0}
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def warm(self):
+        """Start browsers up front so the first queries don't pay the cold start."""
+        while True:
+            with self._cond:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            entry = self._start()
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.popleft()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                # Woken by _release (a browser came back) or _discard (a slot freed up)
+                self._cond.wait()
+        return self._start()
+
+    def _discard(self, entry):
+        try:
+            entry["driver"].quit()
+        except Exception:
+            pass
+        self._free_slot()
+
+    @contextmanager
+    def session(self):
+        entry = self._take()
+        try:
+            yield entry["driver"]
+        except WebDriverException as e:
+            if not isinstance(e, TimeoutException):
+                logger.warning("Browser failed, replacing it: %s", e)
+                self._discard(entry)
+                raise
+            self._release(entry)
+            raise
+        except BaseException:
+            self._release(entry)
+            raise
+        else:
+            self._release(entry)
+
+    def _release(self, entry):
+        entry["uses"] += 1
+        if entry["uses"] >= self.max_uses:
+            self._discard(entry)
+        else:
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def shutdown(self):
+        with self._cond:
+            entries, self._idle = list(self._idle), deque()
+        for entry in entries:
+            self._discard(entry)
+
+
+class CircuitBreaker:
+    """
+    Stops scraping after repeated selector mismatches (Google changed its page),
+    and tries again after SCRAPER_BREAKER_RESET seconds.
+    """
+
+    def __init__(self, threshold=SCRAPER_BREAKER_THRESHOLD, reset_after=SCRAPER_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: let one query through to probe the page again
+                self.opened_at = None
+                self.failures = self.threshold - 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                logger.warning("Google Images selectors stopped matching, scraping paused")
+
+
+chrome_pool = ChromePool()
+selector_breaker = CircuitBreaker()
+
+
+def _full_image_src(seen):
+    """Wait condition: the preview pane shows a full-size image we haven't seen yet."""
+    def condition(driver):
+        for img in driver.find_elements(By.CSS_SELECTOR, PREVIEW_SELECTOR):
+            src = img.get_attribute("src")
+            if src and src not in seen and src.startswith("http") and IMAGE_EXT_RE.search(src):
+                return src
+        return False
+    return condition
+
+
+def scrape_google_images(query, num_images=5):
+    if not selector_breaker.allow():
+        logger.debug("Scraping skipped (circuit open): %s", query)
+        return []
 
-    driver = webdriver.Chrome(options=options)
     encoded_prompt = urllib.parse.quote(query)
     search_url = f"https://www.google.com/search?tbm=isch&q={encoded_prompt}"
-    print(f"Scraping URL: {search_url}")
-    driver.get(search_url)
+    logger.debug("Scraping URL: %s", search_url)
 
     image_urls = []
+    with chrome_pool.session() as driver:
+        driver.get(search_url)
 
-    # Wait for thumbnails to load
-    thumbnails = WebDriverWait(driver, 10).until(
-        EC.presence_of_all_elements_located((By.CSS_SELECTOR, "h3.ob5Hkd img.YQ4gaf"))
-    )
-    print(f"Found {len(thumbnails)} thumbnails")
-
-    for idx, thumb in enumerate(thumbnails[:num_images]):
+        # Wait for thumbnails to load
         try:
-            driver.execute_script("arguments[0].click();", thumb)
-            time.sleep(1)
-
-            # Wait for the large preview image
-            img = WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "img.iPVvYb"))
+            thumbnails = WebDriverWait(driver, 10).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, THUMBNAIL_SELECTOR))
             )
+        except TimeoutException:
+            selector_breaker.record_failure()
+            logger.warning("No thumbnails matched for: %s", query)
+            return []
+        logger.debug("Found %d thumbnails", len(thumbnails))
+
+        for idx, thumb in enumerate(thumbnails[:num_images]):
+            try:
+                driver.execute_script("arguments[0].click();", thumb)
+
+                # Wait for the large preview image to switch to a new full-size src
+                src = WebDriverWait(driver, 5).until(_full_image_src(image_urls))
+                image_urls.append(src)
+                logger.debug("Found full image: %.100s", src)
+
+            except TimeoutException as e:
+                logger.debug("No full image for thumbnail %d: %s", idx, e)
+                continue
+
+    if image_urls:
+        selector_breaker.record_success()
+    else:
+        selector_breaker.record_failure()
+    return image_urls
 
-            src = img.get_attribute("src")
-            if src and re.search(r"\.(jpg|jpeg|png|gif|webp)", src, re.IGNORECASE):
-                if src not in image_urls:
-                    image_urls.append(src)
-                    print(f"✅ Found full image: {src[:100]}...")
 
+def scrape_google_images_batch(queries, num_images=5):
+    """Scrape several queries concurrently across the browser pool, results in query order."""
+    if not queries:
+        return []
+
+    def scrape_one(query):
+        try:
+            return scrape_google_images(query, num_images=num_images)
         except Exception as e:
-            print(f"⚠️ Error on thumbnail {idx}: {e}")
-            continue
+            logger.warning("Scraping failed for %s: %s", query, e)
+            return []
 
-    driver.quit()
-    return image_urls
+    with ThreadPoolExecutor(max_workers=min(chrome_pool.size, len(queries))) as executor:
+        return list(executor.map(scrape_one, queries))
 
 # def scrape_google_images(query, num_images=10):
 #     options = Options()
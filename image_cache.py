@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# ------------------ Image Cache Settings ------------------ #
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "1") == "1"
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pptgen_image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache of normalized images.
+    Entries are keyed by the sha256 of the image URL (or data: payload) and
+    stored as <key>.bin (image bytes) + <key>.json (width, height, format).
+    The total size is bounded; least recently used entries are evicted first.
+
+    The LRU index lives in each process, so max_bytes bounds what one process
+    adds and evicts: processes sharing cache_dir (build pool, bulk workers)
+    can together go past it until one of them reloads the directory.
+    Disk errors never fail a build; the cache just misses.
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = None  # OrderedDict key -> size, oldest first
+        self._total_bytes = 0
+        self._disk_error_logged = False
+
+    @staticmethod
+    def key_for(img_url):
+        return hashlib.sha256(img_url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        return os.path.join(self.cache_dir, key + ".bin"), os.path.join(self.cache_dir, key + ".json")
+
+    def _disk_error(self, e):
+        if not self._disk_error_logged:
+            logger.warning("Image cache unavailable, images are fetched every time: %s", e)
+            self._disk_error_logged = True
+
+    def _load_index(self):
+        """Rebuild the LRU order from file mtimes the first time the cache is used."""
+        if self._index is not None:
+            return
+        entries = []
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".bin"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue   # removed by another process meanwhile
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        except OSError as e:
+            self._disk_error(e)
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+
+    def get(self, img_url):
+        """Return {"data", "width", "height", "format"} or None on a miss."""
+        key = self.key_for(img_url)
+        bin_path, meta_path = self._paths(key)
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                self.misses += 1
+                return None
+            try:
+                with open(bin_path, "rb") as f:
+                    data = f.read()
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                os.utime(bin_path)
+            except (OSError, ValueError):
+                # Entry vanished or is corrupt, treat as a miss
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        return {"data": data, "width": meta.get("width"), "height": meta.get("height"), "format": meta.get("format")}
+
+    def put(self, img_url, image):
+        """Store a normalized image dict as returned by normalize_image()."""
+        data = image["data"]
+        if len(data) > self.max_bytes:
+            return
+        key = self.key_for(img_url)
+        bin_path, meta_path = self._paths(key)
+        meta = {"width": image.get("width"), "height": image.get("height"), "format": image.get("format")}
+        with self._lock:
+            self._load_index()
+            # Write to temp files first so readers (in any process) never see partial entries
+            try:
+                for path, payload, mode in ((meta_path, json.dumps(meta), "w"), (bin_path, data, "wb")):
+                    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    try:
+                        with open(tmp_path, mode) as f:
+                            f.write(payload)
+                        os.replace(tmp_path, path)
+                    except OSError:
+                        try:
+                            os.remove(tmp_path)
+                        except OSError:
+                            pass
+                        raise
+            except OSError as e:
+                self._disk_error(e)
+                return
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _drop(self, key):
+        self._total_bytes -= self._index.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            oldest = next(iter(self._index))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._index or {}),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                self._drop(key)
+
+
+image_cache = ImageCache() if IMAGE_CACHE_ENABLED else None
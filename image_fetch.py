@@ -0,0 +1,128 @@
+import base64
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from image_cache import image_cache
+from image_processing import normalize_image
+
+# ------------------ Image Prefetch Settings ------------------ #
+IMAGE_FETCH_WORKERS = int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))              # per request (connect/read)
+IMAGE_FETCH_TOTAL_TIMEOUT = float(os.getenv("IMAGE_FETCH_TOTAL_TIMEOUT", "30"))  # whole deck
+IMAGE_FETCH_MAX_BYTES = int(os.getenv("IMAGE_FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Shared requests session so connections are pooled across slides and decks."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=IMAGE_FETCH_WORKERS, pool_maxsize=IMAGE_FETCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": "Mozilla/5.0"})
+            _session = session
+        return _session
+
+
+def fetch_image(img_url, deadline=None):
+    """
+    Resolve one image_url to raw bytes.
+    Returns {"data": bytes | None, "status": int | None, "error": str | None}.
+    "status" is the HTTP status of the response; None when there was none or
+    the download was aborted here (size cap, deadline).
+    """
+    if img_url.startswith("data:image"):  # Handle base64-encoded images
+        try:
+            base64_data = img_url.split(",")[1]
+            return {"data": base64.b64decode(base64_data), "status": None, "error": None}
+        except Exception as e:
+            return {"data": None, "status": None, "error": f"invalid data url: {e}"}
+
+    try:
+        with get_session().get(img_url, timeout=IMAGE_FETCH_TIMEOUT, stream=True) as response:
+            logger.debug("Image fetch status: %s", response.status_code)
+            if response.status_code != 200:
+                return {"data": None, "status": response.status_code, "error": f"status code: {response.status_code}"}
+
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > IMAGE_FETCH_MAX_BYTES:
+                return {"data": None, "status": None, "error": f"image too large ({declared} bytes)"}
+
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                received += len(chunk)
+                if received > IMAGE_FETCH_MAX_BYTES:
+                    return {"data": None, "status": None, "error": f"image larger than {IMAGE_FETCH_MAX_BYTES} bytes"}
+                if deadline is not None and time.monotonic() > deadline:
+                    return {"data": None, "status": None, "error": "image fetch deadline exceeded"}
+                chunks.append(chunk)
+            return {"data": b"".join(chunks), "status": 200, "error": None}
+    except Exception as e:
+        return {"data": None, "status": None, "error": str(e)}
+
+
+def resolve_image(img_url, deadline=None):
+    """
+    Cache-aware fetch + normalize of one image_url.
+    Returns the fetch_image() result with "data" replaced by normalized bytes
+    and "width"/"height"/"format" added; repeated URLs skip both the network
+    and Pillow via the on-disk image cache.
+    """
+    if image_cache is not None:
+        cached = image_cache.get(img_url)
+        if cached is not None:
+            return {**cached, "status": 200, "error": None}
+
+    fetched = fetch_image(img_url, deadline)
+    if not fetched["data"]:
+        return fetched
+
+    normalized = normalize_image(fetched["data"])
+    if image_cache is not None and normalized["format"]:
+        image_cache.put(img_url, normalized)
+    return {**fetched, **normalized}
+
+
+def prefetch_images(image_urls):
+    """
+    Fetch all image URLs of a deck in parallel before slides are filled.
+    Returns {url: resolve_image() result}. URLs not done by the total deadline
+    are reported as timed out so a slow host can't stall the build.
+    """
+    urls = list(dict.fromkeys(u for u in image_urls if isinstance(u, str) and u))
+    if not urls:
+        return {}
+
+    deadline = time.monotonic() + IMAGE_FETCH_TOTAL_TIMEOUT
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=min(IMAGE_FETCH_WORKERS, len(urls)))
+    try:
+        futures = {executor.submit(resolve_image, url, deadline): url for url in urls}
+        done, not_done = wait(futures, timeout=IMAGE_FETCH_TOTAL_TIMEOUT)
+        for future in done:
+            results[futures[future]] = future.result()
+        for future in not_done:
+            future.cancel()
+            results[futures[future]] = {"data": None, "status": None, "error": "image fetch deadline exceeded"}
+    finally:
+        # Don't wait for stragglers; they stop at their own deadline check
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if image_cache is not None:
+        logger.debug("Image cache: %s", image_cache.stats())
+    logger.info("Prefetched %d/%d images", sum(1 for r in results.values() if r["data"]), len(urls))
+    return results
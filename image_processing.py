@@ -0,0 +1,96 @@
+import logging
+import os
+from io import BytesIO
+
+from PIL import Image
+
+from image_cache import image_cache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_image(data):
+    """
+    Make raw image bytes embeddable in a PPT.
+    PNG/JPEG are kept as-is, anything else Pillow can read is re-encoded to PNG.
+    Returns {"data", "width", "height", "format"}; format is None if Pillow
+    could not read the image (the raw bytes are returned untouched).
+    """
+    try:
+        img = Image.open(BytesIO(data))
+        width, height = img.size
+        if img.format in ["PNG", "JPEG"]:
+            return {"data": data, "width": width, "height": height, "format": img.format}
+
+        converted_stream = BytesIO()
+        img.convert("RGB").save(converted_stream, format="PNG")
+        return {"data": converted_stream.getvalue(), "width": width, "height": height, "format": "PNG"}
+    except Exception as e:
+        logger.warning("Error converting image: %s", e)
+        return {"data": data, "width": None, "height": None, "format": None}
+
+
+# ------------------ Box Fitting ------------------ #
+EMU_PER_INCH = 914400
+IMAGE_DPI = int(os.getenv("IMAGE_DPI", "150"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def fit_image_to_box(image, width_emu, height_emu, dpi=IMAGE_DPI, quality=IMAGE_JPEG_QUALITY, cache_key=None):
+    """
+    Downscale a normalized image to the pixel size of the shape it is shown in.
+    The box size comes from the placeholder's EMU width/height at `dpi`.
+    Images with transparency or few colours (diagrams, logos) are stored as PNG,
+    photos as JPEG at `quality`. The original bytes are kept when the image is
+    already small enough or re-encoding would not make it smaller.
+    With a cache_key (normally the image URL) the fitted bytes are kept in the
+    image cache, so repeated decks skip the resample as well.
+    Returns {"data", "bytes_before", "bytes_after"}.
+    """
+    data = image["data"]
+    result = {"data": data, "bytes_before": len(data), "bytes_after": len(data)}
+    if not image.get("format") or not width_emu or not height_emu:
+        return result
+
+    target_w = max(1, round(width_emu / EMU_PER_INCH * dpi))
+    target_h = max(1, round(height_emu / EMU_PER_INCH * dpi))
+    src_w, src_h = image["width"], image["height"]
+    if src_w <= target_w and src_h <= target_h:
+        return result
+
+    fit_key = f"{cache_key}#fit={target_w}x{target_h}q{quality}" if cache_key else None
+    if fit_key and image_cache is not None:
+        cached = image_cache.get(fit_key)
+        if cached is not None:
+            result["data"] = cached["data"]
+            result["bytes_after"] = len(cached["data"])
+            return result
+
+    try:
+        img = Image.open(BytesIO(data))
+        # The picture is stretched to the box anyway, so each side is capped independently
+        img = img.resize((min(src_w, target_w), min(src_h, target_h)), Image.LANCZOS)
+
+        out = BytesIO()
+        if _has_alpha(img) or img.getcolors(maxcolors=256) is not None:
+            img.save(out, format="PNG", optimize=True)
+            fitted_format = "PNG"
+        else:
+            img.convert("RGB").save(out, format="JPEG", quality=quality, optimize=True)
+            fitted_format = "JPEG"
+
+        # Describe the bytes actually kept: the re-encode, or the original when it was smaller
+        fitted = {"data": data, "width": src_w, "height": src_h, "format": image["format"]}
+        if out.tell() < len(data):
+            fitted = {"data": out.getvalue(), "width": img.width, "height": img.height, "format": fitted_format}
+            result["data"] = fitted["data"]
+            result["bytes_after"] = out.tell()
+        if fit_key and image_cache is not None:
+            image_cache.put(fit_key, fitted)
+    except Exception as e:
+        logger.warning("Error resizing image: %s", e)
+    return result
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """
+    Named resources that are created on first use: provider SDK clients,
+    database handles, browser pools. Each factory runs once; concurrent
+    get() calls for the same name wait for that one instance. Importing a
+    module that registers services costs nothing until they are used.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._status = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, warm=True):
+        """warm=False keeps a service out of warm() unless it is named explicitly."""
+        with self._lock:
+            self._factories[name] = (factory, warm)
+            self._locks[name] = threading.Lock()
+            self._status[name] = {"ready": False, "init_seconds": None, "error": None}
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+            factory, _ = self._factories[name]
+            start = time.perf_counter()
+            try:
+                instance = factory()
+            except Exception as e:
+                self._status[name].update(ready=False, error=str(e))
+                raise
+            self._status[name].update(ready=True, init_seconds=round(time.perf_counter() - start, 4), error=None)
+            self._instances[name] = instance
+            return instance
+
+    def is_ready(self, name):
+        return name in self._instances
+
+    def warm(self, names=None):
+        """Initialize the named services (default: every warm=True service); returns status()."""
+        if names is None:
+            names = [name for name, (_, warm) in self._factories.items() if warm]
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning("Could not initialize %s: %s", name, e)
+        return self.status()
+
+    def status(self):
+        return {name: dict(status) for name, status in self._status.items()}
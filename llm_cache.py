@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# ------------------ LLM Cache Settings ------------------ #
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")   # memory | mongo | none
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+
+def make_cache_key(model_name, topic, slide_count, prompt_template, mode="single"):
+    """
+    Cache key for one generation: normalized topic, slide count, model name,
+    generation mode and a hash of the prompt template. Changing the prompt
+    changes the hash, so stale answers to an old prompt are never served.
+    """
+    normalized_topic = re.sub(r"\s+", " ", topic.strip().lower())
+    prompt_hash = hashlib.sha256(prompt_template.encode("utf-8")).hexdigest()[:16]
+    raw = json.dumps([model_name, normalized_topic, int(slide_count), mode, prompt_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class InMemoryLRUBackend:
+    """Process-local LRU; values are stored as JSON text so callers can't mutate cached slides."""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, json text)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(payload)
+
+    def set(self, key, value, ttl):
+        payload = json.dumps(value)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MongoBackend:
+    """Shared cache in a Mongo collection; a TTL index removes expired entries."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexed = False
+
+    def _ensure_index(self):
+        """Create the TTL index on first use; retried on later calls while Mongo is unreachable."""
+        if self._indexed:
+            return
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+        except Exception as e:
+            logger.warning("LLM cache TTL index not created: %s", e)
+
+    def get(self, key):
+        self._ensure_index()
+        doc = self.collection.find_one({"_id": key})
+        # The TTL monitor only runs once a minute, so check expiry here too
+        if not doc or doc["expires_at"].replace(tzinfo=timezone.utc) < datetime.now(timezone.utc):
+            return None
+        return json.loads(doc["slides"])
+
+    def set(self, key, value, ttl):
+        self._ensure_index()
+        self.collection.replace_one(
+            {"_id": key},
+            {"_id": key, "slides": json.dumps(value), "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl)},
+            upsert=True,
+        )
+
+    def __len__(self):
+        return self.collection.estimated_document_count()
+
+
+class LLMCache:
+    """Caches parsed slides JSON per generation key, with hit-rate counters."""
+
+    def __init__(self, backend, ttl=LLM_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never fail a generation
+            logger.warning("LLM cache read failed: %s", e)
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+            self.errors += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        try:
+            entries = len(self.backend)
+        except Exception:
+            entries = None
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "ttl": self.ttl,
+        }
+
+
+def create_llm_cache(db=None, backend=LLM_CACHE_BACKEND):
+    """
+    Build the cache selected by LLM_CACHE_BACKEND (None when disabled).
+    db may be a callable returning the database, so failing to reach Mongo
+    also just means no cache.
+    """
+    if backend == "none":
+        return None
+    if backend == "mongo":
+        try:
+            return LLMCache(MongoBackend((db() if callable(db) else db)["llm_cache"]))
+        except Exception as e:
+            logger.warning("LLM cache disabled, Mongo backend unavailable: %s", e)
+            return None
+    return LLMCache(InMemoryLRUBackend())
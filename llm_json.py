@@ -0,0 +1,203 @@
+import json
+import re
+
+# ------------------ LLM JSON Helpers ------------------ #
+# Outside strings we only care about structure; inside strings about the
+# characters that can make the text invalid JSON.
+_STRUCTURE_RE = re.compile(r'["\[\]{},]')
+_STRING_SPECIAL_RE = re.compile(r'["\\\x00-\x1f]')
+_WHITESPACE_RE = re.compile(r'\s*')
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_ARRAY_SEPARATORS = frozenset("{,] \t\r\n")
+
+
+def _repair_array(text, start):
+    """
+    Scan one JSON array starting at text[start] == '['.
+    Copies it while fixing trailing commas, stray backslashes and raw control
+    characters inside strings. Returns (repaired_text, end_index), or None if
+    the array never closes.
+    """
+    out = []
+    depth = 0
+    pos = start
+    n = len(text)
+    while pos < n:
+        m = _STRUCTURE_RE.search(text, pos)
+        if not m:
+            return None
+        ch = m.group()
+        i = m.start()
+        out.append(text[pos:i])
+        if ch == '"':
+            # Copy the string literal, repairing it as we go
+            out.append('"')
+            pos = i + 1
+            while True:
+                sm = _STRING_SPECIAL_RE.search(text, pos)
+                if not sm:
+                    return None
+                j = sm.start()
+                out.append(text[pos:j])
+                sc = sm.group()
+                if sc == '"':
+                    out.append('"')
+                    pos = j + 1
+                    break
+                if sc == "\\":
+                    nxt = text[j + 1:j + 2]
+                    if nxt and nxt in _VALID_ESCAPES:
+                        out.append(text[j:j + 2])
+                        pos = j + 2
+                    else:
+                        out.append("\\\\")   # escape stray backslash
+                        pos = j + 1
+                else:
+                    out.append(_CONTROL_ESCAPES.get(sc, "\\u%04x" % ord(sc)))
+                    pos = j + 1
+            continue
+        if ch == ",":
+            # Drop trailing commas before a closing bracket/brace
+            k = _WHITESPACE_RE.match(text, i + 1).end()
+            if k < n and text[k] in "]}":
+                pos = i + 1
+                continue
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+        out.append(ch)
+        pos = i + 1
+        if depth == 0:
+            return "".join(out), pos
+    return None
+
+
+def repair_json(json_str):
+    """Repair a complete JSON value from LLM output (same fixes as extract_json_array)."""
+    repaired = _repair_array("[" + json_str + "]", 0)
+    if repaired is None:
+        return json_str
+    return repaired[0][1:-1]
+
+
+def decode_json_fragment(json_str):
+    """Decode one JSON value from LLM output, repairing common mistakes."""
+    json_str = repair_json(json_str)
+    try:
+        return json.loads(json_str)
+    except ValueError:
+        # demjson3 can handle non-strict JSON from AI; only imported when needed
+        import demjson3
+        return demjson3.decode(json_str)
+
+
+def extract_json_array(ai_content):
+    """
+    Find and decode the slides array in raw LLM output.
+    The outermost array is located by bracket matching that respects string
+    literals (so prose or code fences around it are ignored), repaired in
+    the same pass and decoded with the C json decoder. demjson3 is only used
+    when the repaired text is still not strict JSON. Raises ValueError.
+    """
+    start = ai_content.find("[")
+    last_error = None
+    while start != -1:
+        repaired = _repair_array(ai_content, start)
+        if repaired is None:
+            break
+        json_str = repaired[0]
+        try:
+            value = json.loads(json_str)
+        except ValueError:
+            try:
+                import demjson3
+                value = demjson3.decode(json_str)
+            except Exception as e2:
+                last_error = e2
+                value = None
+        if isinstance(value, list) and (not value or isinstance(value[0], dict)):
+            return value
+        # Something like "[1]" or "[Note]" in prose before the real array
+        start = ai_content.find("[", start + 1)
+
+    if last_error is not None:
+        raise ValueError(f"Failed to parse AI JSON output: {last_error}")
+    raise ValueError("Could not find JSON array in AI output")
+
+
+class SlideStreamParser:
+    """
+    Incremental parser for a streamed JSON array of slide objects.
+    feed() takes text chunks as they arrive from the LLM and returns every
+    top-level object whose closing brace has been seen, so slides can be
+    sent to the client before the array is complete. Text before the first
+    '[' (e.g. a ```json fence) is skipped, and like extract_json_array, a
+    bracketed aside such as "[see below]" that closes without yielding a
+    slide is skipped too: scanning resumes at the next '['.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0              # next char of _buf to scan
+        self._depth = 0            # 0 = outside the array, 1 = inside it
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None     # index in _buf where the current slide starts
+        self._stray = False        # the array holds something other than objects (prose)
+        self.done = False          # outer array closed
+        self.count = 0
+
+    def feed(self, chunk):
+        if self.done or not chunk:
+            return []
+        self._buf += chunk
+        slides = []
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self._depth == 1 and not self._in_string and ch not in _ARRAY_SEPARATORS:
+                self._stray = True
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 1 and ch == "{":
+                    self._obj_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and ch == "}" and self._obj_start is not None:
+                    slides.append(decode_json_fragment(buf[self._obj_start:i + 1]))
+                    self._obj_start = None
+                elif self._depth == 0:
+                    if self._stray and not self.count and not slides:
+                        # Something like "[see below]" before the real array
+                        self._stray = False
+                        i += 1
+                        continue
+                    self.done = True
+                    i += 1
+                    break
+            i += 1
+
+        # Drop text that has been fully consumed to keep the buffer small
+        keep_from = self._obj_start if self._obj_start is not None else i
+        self._buf = buf[keep_from:]
+        self._pos = i - keep_from
+        if self._obj_start is not None:
+            self._obj_start = 0
+        self.count += len(slides)
+        return slides
@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# ------------------ Prometheus Metrics ------------------ #
+# Stages: llm_call, json_parse, scraping, plan, image_fetch, template_load,
+# slide_cache, slide_duplication, placeholder_fill, zip_save, gridfs_put, download
+# (incremental updates add deck_load and reorder)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "pptgen_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+DECKS_TOTAL = Counter("pptgen_decks_total", "Decks built")
+SLIDES_TOTAL = Counter("pptgen_slides_total", "Slides rendered into decks")
+IMAGES_TOTAL = Counter("pptgen_images_total", "Images embedded into decks")
+BYTES_TOTAL = Counter(
+    "pptgen_bytes_total", "Bytes produced or served",
+    ["kind"],  # deck, image_original, image_embedded, download
+)
+SLIDE_CACHE_TOTAL = Counter("pptgen_slide_cache_lookups_total", "Slide render cache lookups", ["result"])  # hit, miss
+
+
+@contextmanager
+def time_stage(stage):
+    """Observe the wall time of the enclosed block under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def record_build(result):
+    """
+    Observe a finished build_ppt_to_stream() result.
+    Builds may run in worker processes, so their stage timings travel back in
+    result["timings"] and are observed here, in the process serving /metrics.
+    """
+    for stage, seconds in result.get("timings", {}).items():
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    DECKS_TOTAL.inc()
+    SLIDES_TOTAL.inc(result["slides_count"])
+    BYTES_TOTAL.labels(kind="deck").inc(result["size_bytes"])
+    slide_cache = result.get("slide_cache")
+    if slide_cache:
+        SLIDE_CACHE_TOTAL.labels(result="hit").inc(slide_cache["hits"])
+        SLIDE_CACHE_TOTAL.labels(result="miss").inc(slide_cache["misses"])
+    image_report = result.get("image_report")
+    if image_report:
+        IMAGES_TOTAL.inc(image_report["images"])
+        BYTES_TOTAL.labels(kind="image_original").inc(image_report["bytes_before"])
+        BYTES_TOTAL.labels(kind="image_embedded").inc(image_report["bytes_after"])
+
+
+async def timed_download(chunks):
+    """Wrap an async download body iterator to count bytes sent and time the transfer."""
+    start = time.perf_counter()
+    try:
+        async for chunk in chunks:
+            BYTES_TOTAL.labels(kind="download").inc(len(chunk))
+            yield chunk
+    finally:
+        STAGE_SECONDS.labels(stage="download").observe(time.perf_counter() - start)
+
+
+def render_metrics():
+    """Current metrics in the Prometheus text format: (body, content type)."""
+    return generate_latest(), CONTENT_TYPE_LATEST
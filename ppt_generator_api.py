@@ -1,45 +1,94 @@
 from bson import ObjectId
-import certifi
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
-import gridfs
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List
-from pymongo import MongoClient
-import requests
+from typing import List, Optional
 import json
-import demjson3  # pip install demjson3
-from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_PARAGRAPH_ALIGNMENT
-from pptx.dml.color import RGBColor
-from io import BytesIO
 import re
 from dotenv import load_dotenv
-from copy import deepcopy
-from groq import Groq
-from pptgenerator import build_ppt, get_ppt_from_mongodb, store_ppt_in_mongodb
+from lazy_services import ServiceRegistry
+from ppt_jobs import JobQueueFull, get_job, submit_build_job
+from llm_json import SlideStreamParser, extract_json_array
+from llm_cache import LLM_CACHE_BACKEND, create_llm_cache, make_cache_key
+from build_pool import (
+    PPT_BUILD_PROCESSES,
+    build_ppt_in_pool_async,
+    shutdown_build_pool,
+    update_ppt_in_pool_async,
+    warm_build_pool,
+)
+from metrics import record_build, render_metrics, time_stage, timed_download
+import asyncio
+import logging
 import os
+import threading
 load_dotenv()
 
-import google.generativeai as genai
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-
-genai.configure(api_key=gemini_api_key)
-
-uri = os.getenv("MONGODB_URI")  # example: mongodb+srv://...
-client = MongoClient(uri, tlsCAFile=certifi.where())
-db = client["ppt_database"]
-fs = gridfs.GridFS(db)
-
-# ------------------ Groq Client Setup ------------------ #
-# Initialize Groq client with your API key
-api_key = os.getenv("GROQ_API_KEY")
-client = Groq(
-    api_key = api_key
-)
+# LOG_LEVEL=DEBUG turns on the per-request debug output (slides JSON dump, scraping details)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+
+# ------------------ Lazy Services ------------------ #
+# Provider SDKs, MongoDB and the scraper are imported/connected on first use,
+# so importing this module (and starting uvicorn) stays fast.
+GROQ_MODEL_NAME = "meta-llama/llama-4-maverick-17b-128e-instruct"
+GEMINI_MODEL_NAME = "gemini-2.5-flash"  # or gemini-1.5-pro
+PROVIDER_MODEL_NAMES = {"groq": GROQ_MODEL_NAME, "gemini": GEMINI_MODEL_NAME}
+
+def create_groq_client():
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+
+def create_gemini_model():
+    # One model object for the process instead of one per call
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+def create_mongo_client():
+    from storage import get_client
+    client = get_client()
+    client.admin.command("ping")
+    return client
+
+def create_response_cache():
+    # MongoDB is only touched here when the cache lives there; if it can't be
+    # reached, create_llm_cache() returns None and generations run uncached
+    db = None
+    if LLM_CACHE_BACKEND == "mongo":
+        from storage import get_db
+        db = get_db
+    return create_llm_cache(db)
+
+def load_templates():
+    from template_cache import preload_templates
+    preload_templates(["template_iamneo.pptx"])
+    return True
+
+def create_scraper_pool():
+    from googlesrapping import chrome_pool
+    chrome_pool.warm()
+    logger.info("Scraper pool warmed (%d browsers)", chrome_pool.size)
+    return chrome_pool
+
+services = ServiceRegistry()
+services.register("groq", create_groq_client)
+services.register("gemini", create_gemini_model)
+services.register("mongo", create_mongo_client)
+services.register("llm_cache", create_response_cache)
+services.register("templates", load_templates)
+services.register("scraper", create_scraper_pool, warm=False)  # starts headless browsers
+
+async def get_service(name):
+    """services.get() without blocking the event loop on a slow first initialization."""
+    if services.is_ready(name):
+        return services.get(name)
+    return await run_in_threadpool(services.get, name)
+
+# Max LLM generations in flight per /generate-ppt-slides/ request
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
 
 # ------------------ Input Schema ------------------ #
 class SlideRequest(BaseModel):
@@ -47,6 +96,8 @@ class SlideRequest(BaseModel):
     slides: int
     model: str  # New field to specify the model
     scrape_from_google: bool = False  # New field to specify if scraping is needed
+    generation_mode: str = "single"  # "single" = one prompt, "outline" = outline then per-slide fan-out
+    force_fresh: bool = False  # skip the LLM response cache and regenerate
 
 # ------------------ FastAPI app ------------------ #
 origins = [
@@ -66,26 +117,92 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def warm_template_cache():
+    # Parse the deck template once so the first request doesn't pay for it.
+    # Pool workers preload their own copy, so this only matters for in-process builds.
+    if PPT_BUILD_PROCESSES <= 0:
+        threading.Thread(target=services.warm, args=(["templates"],), daemon=True).start()
+
+@app.on_event("startup")
+def warm_scraper_pool():
+    # Start the headless browsers in the background so startup isn't blocked
+    if os.getenv("SCRAPER_WARM_ON_STARTUP", "1") != "1":
+        return
+    threading.Thread(target=services.warm, args=(["scraper"],), daemon=True).start()
+
+@app.on_event("startup")
+def warm_builders():
+    # Spawn the build worker processes (templates preloaded) in the background
+    def warm():
+        try:
+            warm_build_pool()
+        except Exception as e:
+            logger.warning("Could not warm build pool: %s", e)
+
+    threading.Thread(target=warm, daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_builders():
+    shutdown_build_pool()
+
+@app.on_event("shutdown")
+async def close_storage():
+    import sys
+    if "storage" in sys.modules:
+        await sys.modules["storage"].close_clients_async()
+
+@app.on_event("shutdown")
+def stop_scraper_pool():
+    import sys
+    if "googlesrapping" in sys.modules:
+        sys.modules["googlesrapping"].chrome_pool.shutdown()
+
+# ------------------ Readiness ------------------ #
+@app.get("/ready")
+async def readiness(warm: bool = False, service: Optional[List[str]] = None):
+    """
+    Status of the lazily initialized services. warm=true initializes them
+    now (all warm-by-default services, or only the given ?service=...);
+    responds 503 if any of them failed to start.
+    """
+    if warm:
+        statuses = await run_in_threadpool(services.warm, service)
+    else:
+        statuses = services.status()
+    failed = [name for name, status in statuses.items() if status["error"]]
+    return JSONResponse(
+        status_code=503 if failed else 200,
+        content={"ready": not failed, "services": statuses},
+    )
+
 # ------------------ Groq AI Call ------------------ #
-def call_groq_ai_system(user_input: str):
+SLIDES_SYSTEM_PROMPT = (
+    "You are a professional presentation writer. "
+    "Produce a JSON array of slides for the given topic. "
+    "Return ONLY valid JSON."
+)
+
+async def call_groq_ai_system(user_input: str):
     """
     Calls Groq AI endpoint with system/user input and returns JSON slides.
     Replace 'YOUR_GROQ_API_KEY' and endpoint URL with your actual account details.
     """
-    chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a professional presentation writer. Produce a JSON array of slides for the given topic. Return ONLY valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": user_input,
-                }
-            ],
-            # model="llama-3.3-70b-versatile",
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-        )
+    with time_stage("llm_call"):
+        chat_completion = await (await get_service("groq")).chat.completions.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SLIDES_SYSTEM_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": user_input,
+                    }
+                ],
+                # model="llama-3.3-70b-versatile",
+                model=GROQ_MODEL_NAME,
+            )
     
     # Extract the AI-generated content
     try:
@@ -93,33 +210,12 @@ def call_groq_ai_system(user_input: str):
     except (AttributeError, IndexError) as e:
         raise HTTPException(status_code=500, detail=f"Invalid Groq AI response structure: {e}")
 
-    # Extract JSON array substring
-    match = re.search(r"(\[.*\])", ai_content, re.S)
-    if not match:
-        raise HTTPException(status_code=500, detail="Could not find JSON array in AI output")
-
-    json_str = match.group(1)
-
-    # --- Sanitize AI output ---
-    # 1. Escape unescaped backslashes
-    json_str = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', json_str)
-
-    # 2. Remove trailing commas before closing brackets/braces
-    json_str = re.sub(r',(\s*[\]\}])', r'\1', json_str)
-
-    # 3. Ensure all quotes inside strings are escaped
-    # (optional but safer if AI inserts quotes)
-    # json_str = re.sub(r'(?<!\\)"', r'\"', json_str)  # use only if needed
-
-    # --- Parse JSON robustly ---
+    # Locate, repair and decode the JSON array in one pass
     try:
-        # Use demjson3 which can handle non-strict JSON from AI
-        slides = demjson3.decode(json_str)
-        if not isinstance(slides, list):
-            raise HTTPException(status_code=500, detail="AI output is not a JSON array")
-        return slides
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI JSON output: {e}")
+        with time_stage("json_parse"):
+            return extract_json_array(ai_content)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
 
 # def call_gemini_ai_system(user_input: str):
@@ -175,29 +271,22 @@ def call_groq_ai_system(user_input: str):
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=f"Failed to parse AI JSON output: {e}")
 
-def call_gemini_ai_system(user_input: str):
+async def call_gemini_ai_system(user_input: str):
     """
     Calls Gemini AI endpoint with user input and returns JSON slides.
     System prompt is merged into the user role because Gemini only supports 'user' and 'model'.
     """
     try:
-        print("Calling Gemini API...")
-        model = genai.GenerativeModel("gemini-2.5-flash")  # or gemini-1.5-pro
-
-        system_prompt = (
-            "You are a professional presentation writer. "
-            "Produce a JSON array of slides for the given topic. "
-            "Return ONLY valid JSON."
-        )
-
-        response = model.generate_content(
-            [
-                {
-                    "role": "user",
-                    "parts": [f"{system_prompt}\n\nTopic: {user_input}"]
-                }
-            ]
-        )
+        logger.debug("Calling Gemini API...")
+        with time_stage("llm_call"):
+            response = await (await get_service("gemini")).generate_content_async(
+                [
+                    {
+                        "role": "user",
+                        "parts": [f"{SLIDES_SYSTEM_PROMPT}\n\nTopic: {user_input}"]
+                    }
+                ]
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini API call failed: {e}")
 
@@ -207,42 +296,44 @@ def call_gemini_ai_system(user_input: str):
     except AttributeError:
         raise HTTPException(status_code=500, detail="Invalid Gemini response structure")
 
-    # Extract JSON array substring
-    match = re.search(r"(\[.*\])", ai_content, re.S)
-    if not match:
-        raise HTTPException(status_code=500, detail="Could not find JSON array in AI output")
-
-    json_str = match.group(1)
-
-    # --- Sanitize AI output ---
-    json_str = re.sub(r'\\(?!["\\/bfnrtu])', r'\\\\', json_str)   # escape stray backslashes
-    json_str = re.sub(r',(\s*[\]\}])', r'\1', json_str)          # remove trailing commas
-
-    # --- Parse JSON robustly ---
+    # Locate, repair and decode the JSON array in one pass
     try:
-        slides = demjson3.decode(json_str)
-        if not isinstance(slides, list):
-            raise HTTPException(status_code=500, detail="AI output is not a JSON array")
-        return slides
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse AI JSON output: {e}")
+        with time_stage("json_parse"):
+            return extract_json_array(ai_content)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
     
 
-# ------------------ API Endpoint ------------------ #
-@app.post("/generate-ppt-slides/")
-async def generate_ppt_slides(request: List[SlideRequest]):
-    if not request:
-        raise HTTPException(status_code=400, detail="No input provided")
-    
-    # Use first item for simplicity
-    topic = request[0].title
-    slide_count = request[0].slides
-    model = request[0].model
-    scrape_from_google = request[0].scrape_from_google
-
-
-    user_prompt = f"""
+# ------------------ Streaming AI Calls ------------------ #
+async def stream_groq_ai_system(user_input: str):
+    """Yields text chunks of the Groq completion as they are generated."""
+    stream = await (await get_service("groq")).chat.completions.create(
+        messages=[
+            {"role": "system", "content": SLIDES_SYSTEM_PROMPT},
+            {"role": "user", "content": user_input},
+        ],
+        model=GROQ_MODEL_NAME,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def stream_gemini_ai_system(user_input: str):
+    """Yields text chunks of the Gemini response as they are generated."""
+    response = await (await get_service("gemini")).generate_content_async(
+        [{"role": "user", "parts": [f"{SLIDES_SYSTEM_PROMPT}\n\nTopic: {user_input}"]}],
+        stream=True,
+    )
+    async for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+# ------------------ Slide Generation ------------------ #
+def build_slides_prompt(topic: str, slide_count: int):
+    """User prompt asking the LLM for a full deck as a JSON array."""
+    return f"""
     You are a presentation slide generator.
 
     Topic: { topic }
@@ -300,102 +391,368 @@ async def generate_ppt_slides(request: List[SlideRequest]):
     - JSON must be strictly valid.
     """
 
+
+async def call_ai_system(model: str, user_prompt: str):
+    """Dispatch a prompt to the selected provider and return the parsed JSON array."""
     if model == "groq":
-        slides_json = call_groq_ai_system(user_prompt)
-        print("Slides JSON:", slides_json)  # Debugging line
+        return await call_groq_ai_system(user_prompt)
     elif model == "gemini":
-        slides_json = call_gemini_ai_system(user_prompt)
-        print("Slides JSON:", slides_json)
+        return await call_gemini_ai_system(user_prompt)
+    raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+
+# ------------------ Outline + Fan-out Generation ------------------ #
+LLM_SLIDE_CONCURRENCY = int(os.getenv("LLM_SLIDE_CONCURRENCY", "6"))
+LLM_SLIDE_RETRIES = int(os.getenv("LLM_SLIDE_RETRIES", "2"))
+
+def build_outline_prompt(topic: str, slide_count: int):
+    """Prompt for a compact outline: slide titles and image queries only."""
+    return f"""
+    You are a presentation planner.
+
+    Topic: { topic }
+    Number of slides: { slide_count }
+
+    Instructions:
+    - Output ONLY a valid JSON array (no extra text before/after).
+    - First array element must only contain the overall presentation title:
+    {{ "title": "Presentation Title" }}
+    - Then exactly { slide_count } objects, in presentation order, each with:
+    - title (string) → short, clear slide heading; no two slides may overlap in scope
+    - image_url (optional string) → relevant google search query key string.
+    - Do NOT write bullets, code or notes yet.
+    """
+
+def build_slide_body_prompt(topic: str, outline: list, position: int):
+    """Prompt for the full body of one slide from the outline."""
+    titles = "\n".join(f"    {i}. {item.get('title', '')}" for i, item in enumerate(outline, start=1))
+    slide = outline[position - 1]
+    return f"""
+    You are a presentation slide generator.
+
+    Presentation topic: { topic }
+    Full outline (for context only, do not repeat other slides):
+{ titles }
+
+    Write slide { position }: "{ slide.get('title', '') }"
+
+    Instructions:
+    - Output ONLY a valid JSON array containing exactly ONE slide object (no extra text before/after).
+    - The slide object must have:
+    - title (string) → "{ slide.get('title', '') }"
+    - content (array) → 4–5 objects, each with:
+        - "text": a full, detailed bullet sentence with **keywords in bold** (not just short phrases).
+        - "subpoints" (optional array): 4–6 concise sub-bullets expanding on the main point, also with **keywords in bold**.
+    - code (object) → if the topic is technical, MUST include:
+        - "title": a short label explaining what the code demonstrates
+        - "snippet": the snippet should be **multi-line**, detailed, and demonstrate a **practical example** (not trivial). Use `\\n` for line breaks.
+    - notes (optional string) → 2–4 sentences for the presenter to elaborate.
+    - JSON must be strictly valid.
+    """
 
-    with open("debug_slides_json.txt", "w", encoding="utf-8") as f:
-        json.dump(slides_json, f, indent=2)
+async def generate_outline_deck(topic: str, slide_count: int, model: str):
+    """
+    Two-phase generation: one short outline call, then every slide body
+    generated concurrently (bounded by LLM_SLIDE_CONCURRENCY) and merged in
+    outline order. A failing slide is retried on its own; if it still fails
+    the outline entry is kept so the rest of the deck is not lost.
+    Returns (deck, degraded): degraded is True when any slide fell back to
+    its outline entry.
+    """
+    outline = await call_ai_system(model, build_outline_prompt(topic, slide_count))
+    if not outline:
+        raise HTTPException(status_code=500, detail="AI returned an empty outline")
+
+    deck_title, slide_outline = outline[0], outline[1:]
+    semaphore = asyncio.Semaphore(LLM_SLIDE_CONCURRENCY)
+
+    async def generate_slide(position):
+        planned = slide_outline[position - 1]
+        prompt = build_slide_body_prompt(topic, slide_outline, position)
+        for attempt in range(1 + LLM_SLIDE_RETRIES):
+            try:
+                async with semaphore:
+                    result = await call_ai_system(model, prompt)
+                if not result or not isinstance(result[0], dict):
+                    raise ValueError("AI output did not contain a slide object")
+                slide = result[0]
+                slide.setdefault("title", planned.get("title", ""))
+                if planned.get("image_url") and not slide.get("image_url"):
+                    slide["image_url"] = planned["image_url"]
+                return slide, False
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else e
+                logger.warning("Slide %d attempt %d failed: %s", position, attempt + 1, detail)
+        return dict(planned), True
+
+    results = await asyncio.gather(*(generate_slide(i) for i in range(1, len(slide_outline) + 1)))
+    return [deck_title, *(slide for slide, _ in results)], any(fallback for _, fallback in results)
+
+async def generate_slides_for_request(slide_request: SlideRequest):
+    """Generate (and optionally scrape images for) one SlideRequest."""
+    topic = slide_request.title
+    slide_count = slide_request.slides
+    model = slide_request.model
+    scrape_from_google = slide_request.scrape_from_google
+
+    if model not in ("groq", "gemini"):
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+
+    slides_json = None
+    llm_cache = await get_service("llm_cache")
+    if llm_cache is not None:
+        if slide_request.generation_mode == "outline":
+            prompt_template = build_outline_prompt("{topic}", "{slide_count}") + build_slide_body_prompt("{topic}", [{"title": "{title}"}], 1)
+        else:
+            prompt_template = build_slides_prompt("{topic}", "{slide_count}")
+        cache_key = make_cache_key(PROVIDER_MODEL_NAMES[model], topic, slide_count, prompt_template, slide_request.generation_mode)
+        if not slide_request.force_fresh:
+            slides_json = await run_in_threadpool(llm_cache.get, cache_key)
+            if slides_json is not None:
+                logger.debug("LLM cache hit for: %s", topic)
+
+    if slides_json is None:
+        degraded = False
+        if slide_request.generation_mode == "outline":
+            slides_json, degraded = await generate_outline_deck(topic, slide_count, model)
+        else:
+            slides_json = await call_ai_system(model, build_slides_prompt(topic, slide_count))
+        if degraded:
+            # Don't keep serving title-only fallback slides after a transient LLM failure
+            logger.info("Outline deck has fallback slides, not cached: %s", topic)
+        elif llm_cache is not None:
+            # Cached before scraping so the image queries, not scraped URLs, are stored
+            await run_in_threadpool(llm_cache.set, cache_key, slides_json)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Slides JSON: %s", slides_json)
+        with open("debug_slides_json.txt", "w", encoding="utf-8") as f:
+            json.dump(slides_json, f, indent=2)
 
     # call google scrapping for image_url if image_url is present in slide_json
-    print(f"Scrape from Google: {scrape_from_google}")
+    logger.debug("Scrape from Google: %s", scrape_from_google)
     if scrape_from_google:
-        from googlesrapping import scrape_google_images
-        for slide in slides_json:
-            if "image_url" in slide and slide["image_url"]:
-                query = slide["image_url"]
-                print(f"Scraping images for query: {query}")
-                image_urls = scrape_google_images(query, num_images=5)
-                print(f"Scraped {len(image_urls)} image URLs")
-                if image_urls:
-                    slide["image_url"] = image_urls[0]  # Use the first valid image URL
-                    print(f"Found image URL: {slide['image_url']}")
-                else:
-                    print(f"No valid images found for query: {query}")
-                    slide["image_url"] = None  # Clear if no valid image found
+        from googlesrapping import scrape_google_images_batch
+        image_slides = [slide for slide in slides_json if "image_url" in slide and slide["image_url"]]
+        queries = [slide["image_url"] for slide in image_slides]
+        logger.debug("Scraping images for %d queries", len(queries))
+        # Queries run concurrently across the browser pool, off the event loop
+        with time_stage("scraping"):
+            results = await run_in_threadpool(scrape_google_images_batch, queries, 5)
+        for slide, query, image_urls in zip(image_slides, queries, results):
+            logger.debug("Scraped %d image URLs", len(image_urls))
+            if image_urls:
+                slide["image_url"] = image_urls[0]  # Use the first valid image URL
+                logger.debug("Found image URL: %s", slide["image_url"])
             else:
-                print("No image_url field in slide or it's empty.")
-    
+                logger.debug("No valid images found for query: %s", query)
+                slide["image_url"] = None  # Clear if no valid image found
 
-    # Paths
-    template_path = "template_iamneo.pptx"
-    temp_path = "temp.pptx"
-    # split the topic and take first 5 words and join with _
-    topic_words = topic.split()[:5]
-    topic_short = "_".join(topic_words)
-    output_path = f"{topic_short}.pptx"
-    print(f"Output path: {output_path}")
+    return slides_json
 
-    # Build PPT
-    # build_ppt(template_path, slides_json, output_path, temp_path)
-    # ppt_id = store_ppt_in_mongodb(output_path, Path(output_path).name)
-    # get_ppt_from_mongodb(ppt_id, f"downloaded_{Path(output_path).name}")
-    # ppt_len = Presentation(output_path)
-    # delete temp file and fiel in output path
-    Path(temp_path).unlink(missing_ok=True)
-    Path(output_path).unlink(missing_ok=True)
+# ------------------ API Endpoint ------------------ #
+@app.post("/generate-ppt-slides/")
+async def generate_ppt_slides(request: List[SlideRequest]):
+    if not request:
+        raise HTTPException(status_code=400, detail="No input provided")
+
+    # Every item is generated concurrently, at most LLM_MAX_CONCURRENCY at a time
+    semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
-    return {"slides": slides_json}
+    async def generate(slide_request):
+        async with semaphore:
+            return await generate_slides_for_request(slide_request)
+
+    decks = await asyncio.gather(*(generate(item) for item in request))
+
+    # "slides" keeps the single-deck response shape the editor expects
+    return {"slides": decks[0], "decks": decks}
 
 
     # return {"message": "PPT generated successfully", "output_file": output_path, "slides_count": len(ppt_len.slides), "ppt_id": str(ppt_id)}
 
+@app.post("/generate-ppt-slides/stream")
+async def generate_ppt_slides_stream(request: SlideRequest, format: str = "ndjson"):
+    """
+    Streams slides to the client as soon as each slide object is complete.
+    format=ndjson (default) sends one JSON object per line, format=sse sends
+    Server-Sent Events. Each message is {"type": "slide", "index", "slide"},
+    followed by {"type": "done", "count"} or {"type": "error", "detail"}.
+    """
+    if request.model == "groq":
+        chunks = stream_groq_ai_system(build_slides_prompt(request.title, request.slides))
+    elif request.model == "gemini":
+        chunks = stream_gemini_ai_system(build_slides_prompt(request.title, request.slides))
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {request.model}")
+
+    def encode(message):
+        if format == "sse":
+            return f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        return json.dumps(message) + "\n"
+
+    async def scrape_image(slide):
+        from googlesrapping import scrape_google_images
+        query = slide["image_url"]
+        with time_stage("scraping"):
+            image_urls = await run_in_threadpool(scrape_google_images, query, 5)
+        slide["image_url"] = image_urls[0] if image_urls else None
+
+    async def events():
+        parser = SlideStreamParser()
+        try:
+            async for text in chunks:
+                for slide in parser.feed(text):
+                    if request.scrape_from_google and isinstance(slide, dict) and slide.get("image_url"):
+                        await scrape_image(slide)
+                    yield encode({"type": "slide", "index": parser.count - 1, "slide": slide})
+                if parser.done:
+                    break
+            yield encode({"type": "done", "count": parser.count})
+        except Exception as e:
+            yield encode({"type": "error", "detail": f"Slide generation failed: {e}"})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+
+def ppt_output_name(slides_json):
+    """File name for a deck: first 5 words of the title, letters and underscores only."""
+    topic = slides_json[0].get("title", "Generated_Presentation")
+    # output_path = f"{topic.replace(' ', '_')}.pptx"
+    topic_words = topic.split()[:5]
+    logger.debug("Topic words: %s", topic_words)
+    topic_short = "_".join(topic_words)
+    # Remove any non-alpha characters except underscore
+    topic_short_alpha = re.sub(r'[^A-Za-z_]', '', topic_short)
+    return f"{topic_short_alpha}.pptx"
+
 @app.post("/generate-ppt/")
 #  request in slide json format
-def generate_ppt(request: List[dict]):
+async def generate_ppt(request: List[dict]):
     if not request:
         raise HTTPException(status_code=400, detail="No input provided")
 
     slides_json = request
-    topic = slides_json[0].get("title", "Generated_Presentation")
     # Paths
     template_path = "template_iamneo.pptx"
-    temp_path = "temp.pptx"
-    # output_path = f"{topic.replace(' ', '_')}.pptx"
-    topic_words = topic.split()[:5]
-    print(f"Topic words: {topic_words}")
-    topic_short = "_".join(topic_words)
-    # Remove any non-alpha characters except underscore
-    topic_short_alpha = re.sub(r'[^A-Za-z_]', '', topic_short)
-    output_path = f"{topic_short_alpha}.pptx"
-    print(f"Output path: {output_path}")
+    output_path = ppt_output_name(slides_json)
+    logger.debug("Output path: %s", output_path)
+
+    # Build PPT in memory on the process pool (no temp/output files on disk)
+    result = await build_ppt_in_pool_async(template_path, slides_json)
+    record_build(result)
+    from storage import store_ppt_record_async
+    with time_stage("gridfs_put"):
+        stored = await store_ppt_record_async(result["stream"], output_path, render_state=result["render_state"])
+
+    # On a content-hash hit the earlier deck (and its file name) is returned
+    return {"message": "PPT generated successfully", "output_file": stored["filename"], "slides_count": result["slides_count"],
+            "ppt_id": str(stored["ppt_id"]), "deduplicated": stored["deduplicated"]}
+
+@app.post("/update-ppt/{ppt_id}")
+#  request in slide json format: the full edited deck
+async def update_ppt(ppt_id: str, request: List[dict]):
+    """
+    Rebuild a stored deck from edited slide JSON. Only slides that changed
+    (or were inserted) are rendered; the rest are reused from the stored
+    deck, so fixing one typo costs about one slide of work. The updated deck
+    is stored as a new file; the original stays downloadable.
+    """
+    if not request:
+        raise HTTPException(status_code=400, detail="No input provided")
 
-    # Build PPT
-    build_ppt(template_path, slides_json, output_path, temp_path)
-    ppt_id = store_ppt_in_mongodb(output_path, Path(output_path).name)
-    # get_ppt_from_mongodb(ppt_id, f"downloaded_{Path(output_path).name}")
-    ppt_len = Presentation(output_path)
-    # delete temp file and fiel in output path
-    Path(temp_path).unlink(missing_ok=True)
-    Path(output_path).unlink(missing_ok=True)
+    from storage import read_ppt_async, store_ppt_record_async
+    try:
+        ppt_file, deck = await read_ppt_async(ObjectId(ppt_id))
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"PPT not found: {e}")
+
+    template_path = "template_iamneo.pptx"
+    render_state = (ppt_file.metadata or {}).get("render")
+    result = await update_ppt_in_pool_async(template_path, deck, render_state, request)
+    record_build(result)
+    output_path = ppt_output_name(request)
+    with time_stage("gridfs_put"):
+        stored = await store_ppt_record_async(result["stream"], output_path, render_state=result["render_state"])
+
+    return {
+        "message": "PPT updated successfully",
+        "output_file": stored["filename"],
+        "slides_count": result["slides_count"],
+        "rendered_slides": result["rendered_slides"],
+        "reused_slides": result["reused_slides"],
+        "ppt_id": str(stored["ppt_id"]),
+        "deduplicated": stored["deduplicated"],
+    }
+
+# ------------------ Background Jobs ------------------ #
+@app.post("/jobs/generate-ppt/", status_code=202)
+def submit_generate_ppt_job(request: List[dict]):
+    if not request:
+        raise HTTPException(status_code=400, detail="No input provided")
 
-    return {"message": "PPT generated successfully", "output_file": output_path, "slides_count": len(ppt_len.slides), "ppt_id": str(ppt_id)}
+    output_path = ppt_output_name(request)
+    try:
+        job_id = submit_build_job("template_iamneo.pptx", request, output_path)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many PPT jobs in progress: {e}")
+
+    return {"job_id": job_id, "status_url": f"/jobs/{job_id}", "download_url": f"/jobs/{job_id}/download"}
+
+@app.get("/jobs/{job_id}")
+def get_ppt_job(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/download")
+def download_ppt_job(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"PPT job failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"PPT job not finished (stage: {job['stage']}, {job['progress']}%)")
+    return RedirectResponse(url=f"/download/{job['ppt_id']}", status_code=303)
+
+@app.get("/llm-cache/stats")
+def get_llm_cache_stats():
+    llm_cache = services.get("llm_cache")
+    if llm_cache is None:
+        return {"backend": None}
+    return llm_cache.stats()
+
+@app.get("/storage/dedup-stats")
+def get_storage_dedup_stats():
+    from storage import get_dedup_stats
+    return get_dedup_stats()
+
+@app.get("/metrics")
+def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/storage/pool-stats")
+def get_storage_pool_stats():
+    from storage import get_pool_stats
+    return get_pool_stats()
 
 @app.get("/download/{ppt_id}")
-def download_ppt(ppt_id: str):
+async def download_ppt(ppt_id: str):
+    from storage import iter_ppt_chunks_async, open_ppt_download_async
     try:
         file_id = ObjectId(ppt_id)
-        ppt_file = fs.get(file_id)
-        print(ppt_file.filename)
+        ppt_file = await open_ppt_download_async(file_id)
+        logger.debug("Downloading %s", ppt_file.filename)
 
+        # Sent one GridFS chunk at a time; the deck is never held in memory whole
         return StreamingResponse(
-            ppt_file,
+            timed_download(iter_ppt_chunks_async(ppt_file)),
             media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
             headers={
-                "Content-Disposition": f"attachment; filename={ppt_file.filename}"
+                "Content-Disposition": f"attachment; filename={ppt_file.filename}",
+                "Content-Length": str(ppt_file.length),
             }
         )
     except Exception as e:
@@ -0,0 +1,91 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from build_pool import build_ppt_in_pool
+from metrics import record_build, time_stage
+
+logger = logging.getLogger(__name__)
+
+# ------------------ Job Settings ------------------ #
+PPT_JOB_WORKERS = int(os.getenv("PPT_JOB_WORKERS", "2"))
+PPT_JOB_MAX_PENDING = int(os.getenv("PPT_JOB_MAX_PENDING", "50"))
+PPT_JOB_TTL = float(os.getenv("PPT_JOB_TTL", "3600"))  # seconds a finished job stays queryable
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=PPT_JOB_WORKERS, thread_name_prefix="ppt-job")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _update(job_id, **fields):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+            job["updated_at"] = time.time()
+
+
+def _purge_expired():
+    cutoff = time.time() - PPT_JOB_TTL
+    for job_id in [j for j, job in _jobs.items() if job["status"] in ("done", "failed") and job["updated_at"] < cutoff]:
+        del _jobs[job_id]
+
+
+def _run_job(job_id, template_path, slides_json, ppt_name):
+    from storage import store_ppt_record
+    _update(job_id, status="running")
+    try:
+        result = build_ppt_in_pool(
+            template_path, slides_json,
+            progress=lambda stage, percent: _update(job_id, stage=stage, progress=percent),
+        )
+        record_build(result)
+        _update(job_id, stage="upload", progress=90, slides_count=result["slides_count"])
+        with time_stage("gridfs_put"):
+            stored = store_ppt_record(result["stream"], ppt_name, render_state=result["render_state"])
+        # A deduplicated deck keeps its earlier file name; report that one with its id
+        _update(job_id, status="done", stage="done", progress=100, ppt_id=str(stored["ppt_id"]),
+                output_file=stored["filename"], deduplicated=stored["deduplicated"])
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        _update(job_id, status="failed", error=str(e))
+
+
+def submit_build_job(template_path, slides_json, ppt_name):
+    """Queue a deck build + GridFS upload and return its job id right away."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _lock:
+        _purge_expired()
+        pending = sum(1 for job in _jobs.values() if job["status"] in ("queued", "running"))
+        if pending >= PPT_JOB_MAX_PENDING:
+            raise JobQueueFull(f"{pending} jobs already pending")
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",       # queued -> running -> done | failed
+            "stage": "queued",        # planning, image_fetch, fill, save, upload, done
+            "progress": 0,
+            "output_file": ppt_name,
+            "slides_count": None,
+            "ppt_id": None,
+            "deduplicated": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    _executor.submit(_run_job, job_id, template_path, slides_json, ppt_name)
+    return job_id
+
+
+def get_job(job_id):
+    """Snapshot of a job's status, or None if unknown or expired."""
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
@@ -1,466 +1,395 @@
+from contextlib import contextmanager
 from copy import deepcopy
 import json
+import logging
 import re
 import re
 import requests
 from io import BytesIO
+from lxml import etree
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.dml.color import RGBColor
 from pptx.enum.text import MSO_AUTO_SIZE, PP_PARAGRAPH_ALIGNMENT
-from pymongo import MongoClient
-import gridfs
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, nsuri
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.parts.image import ImagePart
+from pptx.text.text import _Paragraph
 import base64
+import hashlib
 from dotenv import load_dotenv
 from pathlib import Path
 import os
-import certifi
+import time
+from template_cache import get_template, template_fingerprint
+from text_layout import DEFAULT_TEXT_LAYOUT, TextFitLayout, TextMeasurer
+from image_fetch import prefetch_images, resolve_image
+from image_processing import fit_image_to_box
+from slide_cache import slide_cache
+# Storage helpers live in storage.py; re-exported for existing callers
+from storage import (
+    get_dedup_stats,
+    get_ppt_from_mongodb,
+    iter_ppt_chunks,
+    open_ppt_download,
+    store_ppt_in_mongodb,
+)
 load_dotenv()
 
-# MongoDB connection
-uri = os.getenv("MONGODB_URI")
+logger = logging.getLogger(__name__)
 
-# client = MongoClient(uri)
-client = MongoClient(uri, tlsCAFile=certifi.where())
-
-db = client['ppt_database']       # database name
-fs = gridfs.GridFS(db)            # GridFS instance
+# ------------------ Helper Functions ------------------ #
+# **bold** / *italic* markup; split() keeps the marked-up tokens
+INLINE_MARKUP_RE = re.compile(r'(\*\*.*?\*\*|\*.*?\*)')
+# Control characters python-pptx writes as _xHHHH_ escapes (tab and newline are kept)
+CTRL_CHAR_RE = re.compile(r'([\x00-\x08\x0B-\x1F])')
+
+# Fonts of filled text; text_layout measures with the same ones
+BULLET_FONT = ("Calibri", 22)
+BULLET_SPACE_AFTER_PT = 5
+CODE_FONT = ("Consolas", 14)
+
+# Bullet text is Calibri 22pt black; one <a:r> template per bold/italic combination
+_BULLET_RUN_XML = (
+    '<a:r %s><a:rPr%s sz="{size}"><a:solidFill><a:srgbClr val="000000"/></a:solidFill>'
+    '<a:latin typeface="{font}"/></a:rPr><a:t/></a:r>'
+).format(font=BULLET_FONT[0], size=BULLET_FONT[1] * 100)
+_BULLET_RUNS = {
+    (False, False): parse_xml(_BULLET_RUN_XML % (nsdecls("a"), "")),
+    (True, False): parse_xml(_BULLET_RUN_XML % (nsdecls("a"), ' b="1"')),
+    (False, True): parse_xml(_BULLET_RUN_XML % (nsdecls("a"), ' i="1"')),
+}
+_bullet_paragraphs = {}
+
+def _bullet_paragraph_template(level):
+    """Justified <a:p> with 5pt space after, cached per outline level."""
+    template = _bullet_paragraphs.get(level)
+    if template is None:
+        lvl = f' lvl="{level}"' if level else ""
+        template = parse_xml(
+            f'<a:p {nsdecls("a")}><a:pPr{lvl} algn="just">'
+            f'<a:spcAft><a:spcPts val="{BULLET_SPACE_AFTER_PT * 100}"/></a:spcAft></a:pPr></a:p>'
+        )
+        _bullet_paragraphs[level] = template
+    return template
+
+def tokenize_inline_markup(text):
+    """Split bullet text into (text, bold, italic) runs."""
+    runs = []
+    for token in INLINE_MARKUP_RE.split(text):
+        if token.startswith("**") and token.endswith("**"):
+            runs.append((token[2:-2], True, False))
+        elif token.startswith("*") and token.endswith("*"):
+            runs.append((token[1:-1], False, True))
+        else:
+            runs.append((token, False, False))
+    return runs
 
-def store_ppt_in_mongodb(file_path: str, ppt_name: str):
+def add_bulleted_paragraphs(tf, items):
     """
-    Stores a PPT file in MongoDB GridFS
+    Add a block of bullets to a text frame in one operation.
+    items: iterable of (text, level) pairs; level 0 = main bullet, 1 = sub-bullet.
+    The <a:p>/<a:r> elements are copied from cached templates instead of being
+    built property by property through python-pptx.
+    Returns the new <a:p> elements.
     """
-    file_path_obj = Path(file_path)
-    if not file_path_obj.exists():
-        raise FileNotFoundError(f"{file_path} not found")
-
-    # Read binary content
-    with open(file_path, "rb") as f:
-        file_data = f.read()
-
-    # Store in GridFS
-    file_id = fs.put(file_data, filename=ppt_name, contentType="application/vnd.openxmlformats-officedocument.presentationml.presentation")
-    print(f"✅ Stored PPT in MongoDB with ID: {file_id}")
-    return file_id
-
-def get_ppt_from_mongodb(file_id, save_path):
-    data = fs.get(file_id).read()
-    with open(save_path, "wb") as f:
-        f.write(data)
-    print(f"✅ Retrieved PPT from MongoDB: {save_path}")
-
+    new_paragraphs = []
+    for text, level in items:
+        p = deepcopy(_bullet_paragraph_template(level))
+        for run_text, bold, italic in tokenize_inline_markup(text):
+            r = deepcopy(_BULLET_RUNS[(bold, italic)])
+            r[-1].text = CTRL_CHAR_RE.sub(lambda m: "_x%04X_" % ord(m.group(1)), run_text)
+            p.append(r)
+        new_paragraphs.append(p)
+
+    # <a:p> elements are the last children of <p:txBody>
+    tf._txBody.extend(new_paragraphs)
+    return new_paragraphs
 
-# ------------------ Helper Functions ------------------ #
 def add_bulleted_paragraph(tf, text, level=0):
     """
     Add a paragraph with bullet support and bold/italic formatting.
     level: 0 = main bullet, 1 = sub-bullet
     """
-    p = tf.add_paragraph()
-    p.level = level
-    p.alignment = PP_PARAGRAPH_ALIGNMENT.JUSTIFY
-    p.space_after = Pt(5)
-    p.bullet = True
+    p = add_bulleted_paragraphs(tf, [(text, level)])[0]
+    return _Paragraph(p, tf)
+
+# ------------------ Placeholder Index ------------------ #
+RUN_TOKENS = ("{title}", "codetitle", "{code}", "{notes}", "imageurl")
+
+def compile_placeholder_index(slide):
+    """
+    Locate every placeholder token on a slide once.
+    Returns a list of {"shape": position, "content": bool, "runs": [(para, run, token)]}
+    in document order. Slides duplicated from the same template slide share
+    the same shape tree, so one index is reused for all of them.
+    """
+    index = []
+    for shape_pos, shape in enumerate(slide.shapes):
+        if not shape.has_text_frame:
+            continue
+        has_content = False
+        runs = []
+        for para_pos, para in enumerate(shape.text_frame.paragraphs):
+            for run_pos, run in enumerate(para.runs):
+                txt = run.text.strip()
+                if txt == "{content}":
+                    has_content = True
+                elif txt in RUN_TOKENS:
+                    runs.append((para_pos, run_pos, txt))
+        if has_content or runs:
+            index.append({"shape": shape_pos, "content": has_content, "runs": runs})
+    return index
 
-    # Temporarily add text for formatting
-    p.text = ""
-    tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', text)
-    for token in tokens:
+# ------------------ Placeholder Replacement ------------------ #
+def fill_content(tf, content):
+    """Replace a {content} text frame with bullets and sub-bullets."""
+    # Handle content replacement specially to maintain bullet formatting.
+    # Fixed box: plan_slides() already split the content to fit above the footer.
+    tf.auto_size = MSO_AUTO_SIZE.NONE
+
+    # Get the original bullet formatting from the first paragraph
+    first_para = tf.paragraphs[0] if tf.paragraphs else tf.add_paragraph()
+
+    # Clear all paragraphs except the first one
+    for i in range(len(tf.paragraphs) - 1, 0, -1):
+        tf.paragraphs[i]._element.getparent().remove(tf.paragraphs[i]._element)
+
+    # Clear the first paragraph's text but keep its formatting
+    first_para.clear()
+
+    # Process content - treat each content item as a separate bullet point
+    if content:
+        bullets = []
+        for item in content:
+            if isinstance(item, dict):
+                main_text = item.get("text", "")
+                if main_text:
+                    bullets.append((main_text, 0))
+
+                for sub in item.get("subpoints", []):
+                    bullets.append((sub, 1))
+
+            else:
+                bullets.append((str(item), 0))
+        add_bulleted_paragraphs(tf, bullets)
+
+def fill_code(shape, run, data):
+    """Replace a {code} run with the snippet, or drop the shape if there is no code."""
+    if "code" in data and data["code"]:
+        tf = shape.text_frame
+        tf.clear()
+        tf.auto_size = MSO_AUTO_SIZE.NONE   # plan_slides() split the code to fit
+        p = tf.paragraphs[0] if tf.paragraphs else tf.add_paragraph()
+        p.clear()
         run = p.add_run()
-        if token.startswith("**") and token.endswith("**"):
-            run.text = token[2:-2]
-            run.font.bold = True
-        elif token.startswith("*") and token.endswith("*"):
-            run.text = token[1:-1]
-            run.font.italic = True
+        if isinstance(data["code"], dict):
+            run.text = data["code"].get("snippet", "")
         else:
-            run.text = token
-        run.font.name = "Calibri"
-        run.font.size = Pt(22)
+            run.text = data["code"]
+        run.font.name = CODE_FONT[0]
+        run.font.size = Pt(CODE_FONT[1])
         run.font.color.rgb = RGBColor(0, 0, 0)
+        p.level = 0
+    else:
+        run.text = ""
+        #  delete the placeholder shape
+        sp = shape.element
+        sp.getparent().remove(sp)
+
+def fill_image(slide, shape, run, data, images=None, report=None):
+    """
+    Replace an imageurl run with the slide's picture, sized to the shape.
+    plan_slides() only leaves image_url on slides where the picture fits below the text.
+    """
+    if "image_url" not in data:
+        run.text = ""
+        return
 
-    return p
+    try:
+        img_url = data["image_url"]
 
-# ------------------ Placeholder Replacement ------------------ #
-def replace_placeholders(slide, data):
-    """Replace placeholders in a slide."""
-    """Replace placeholders in a slide."""
-    for shape in slide.shapes:
-        if not shape.has_text_frame:
+        # Images are normally prefetched for the whole deck;
+        # fall back to a single fetch for direct callers.
+        if images is not None and img_url in images:
+            fetched = images[img_url]
+        else:
+            fetched = resolve_image(img_url)
+
+        # Bytes are already normalized to PNG/JPEG by resolve_image
+        if not fetched["data"]:
+            if fetched["status"] and not 200 <= fetched["status"] < 300:
+                run.text = f"status code: {fetched['status']} -> {img_url}"
+                return
+            raise ValueError(fetched["error"])
+
+        run.text = ""
+        left, top, width, height = shape.left, shape.top, shape.width, shape.height
+
+        # Downscale to the box it is shown in before embedding
+        fitted = fit_image_to_box(fetched, width, height, cache_key=img_url)
+        if report is not None:
+            report["images"] += 1
+            report["bytes_before"] += fitted["bytes_before"]
+            report["bytes_after"] += fitted["bytes_after"]
+        slide.shapes.add_picture(BytesIO(fitted["data"]), left, top, width=width, height=height)
+
+        # remove original placeholder
+        sp = shape.element
+        sp.getparent().remove(sp)
+
+    except Exception as e:
+        logger.warning("Could not add image: %s", e)
+        run.text = ""
+
+def replace_placeholders(slide, data, images=None, report=None, placeholder_index=None):
+    """
+    Replace placeholders in a slide.
+    images: optional {url: resolved image} from prefetch_images(), used instead of fetching inline.
+    report: optional dict from new_image_report(), updated with embedded image sizes.
+    placeholder_index: compile_placeholder_index() of the template slide this
+    slide was copied from; compiled from the slide itself when omitted.
+    """
+    if placeholder_index is None:
+        placeholder_index = compile_placeholder_index(slide)
+
+    shapes = list(slide.shapes)
+    for entry in placeholder_index:
+        shape = shapes[entry["shape"]]
+
+        if entry["content"] and "content" in data:
+            fill_content(shape.text_frame, data["content"])
             continue
 
-        # Check if this text frame contains the {content} placeholder
-        content_placeholder_found = False
-        for para in shape.text_frame.paragraphs:
-            for run in para.runs:
-                if run.text.strip() == "{content}":
-                    content_placeholder_found = True
-                    break
-            if content_placeholder_found:
-                break
-        
-        if content_placeholder_found and "content" in data:
-            # Handle content replacement specially to maintain bullet formatting
-            tf = shape.text_frame
-            # tf.clear()
-            tf.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-            
-            # Get the original bullet formatting from the first paragraph
-            first_para = tf.paragraphs[0] if tf.paragraphs else tf.add_paragraph()
-            original_level = first_para.level
-            
-            # Clear all paragraphs except the first one
-            for i in range(len(tf.paragraphs) - 1, 0, -1):
-                tf.paragraphs[i]._element.getparent().remove(tf.paragraphs[i]._element)
-            
-            # Clear the first paragraph's text but keep its formatting
-            first_para.clear()
-            
-            # Process content - treat each content item as a separate bullet point
-            if data["content"]:
-                content_items = []
-                
-                # Flatten content structure - each main text becomes a bullet point
-                for item in data["content"]:
-                    if isinstance(item, dict):
-                        main_text = item.get("text", "")
-                        if main_text:
-                            add_bulleted_paragraph(tf, main_text, level=0)
-
-                        for sub in item.get("subpoints", []):
-                            add_bulleted_paragraph(tf, sub, level=1)
-
-                    else:
-                        add_bulleted_paragraph(tf, str(item), level=0)
-                
-                # Add first content item to the existing first paragraph
-                # if content_items:
-                #     first_content = content_items[0]
-                #     tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', first_content)
-                #     for token in tokens:
-                #         run = first_para.add_run()
-                #         if token.startswith("**") and token.endswith("**"):
-                #             run.text = token[2:-2]
-                #             run.font.bold = True
-                #         elif token.startswith("*") and token.endswith("*"):
-                #             run.text = token[1:-1]
-                #             run.font.italic = True
-                #         else:
-                #             run.text = token
-                #         run.font.name = "Calibri"
-                #         run.font.size = Pt(22)
-                #         run.font.color.rgb = RGBColor(0, 0, 0)
-                    
-                #     # Set the original level for first paragraph
-                #     first_para.level = original_level
-                    
-                #     # Add remaining content items as new paragraphs with same formatting
-                #     for content_text in content_items[1:]:
-                #         new_para = tf.add_paragraph()
-                #         new_para.level = original_level
-                #         new_para.alignment = PP_PARAGRAPH_ALIGNMENT.JUSTIFY
-                #         new_para.space_after = Pt(5)
-                        
-                #         tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', content_text)
-                #         for token in tokens:
-                #             run = new_para.add_run()
-                #             if token.startswith("**") and token.endswith("**"):
-                #                 run.text = token[2:-2]
-                #                 run.font.bold = True
-                #             elif token.startswith("*") and token.endswith("*"):
-                #                 run.text = token[1:-1]
-                #                 run.font.italic = True
-                #             else:
-                #                 run.text = token
-                #             run.font.name = "Calibri"
-                #             run.font.size = Pt(22)
-                #             run.font.color.rgb = RGBColor(0, 0, 0)
-            
-                # Add first content item to the existing first paragraph
-                # First content item
-                if content_items:
-                    first_content = content_items[0]
-
-                    first_para.level = original_level
-                    first_para.alignment = PP_PARAGRAPH_ALIGNMENT.JUSTIFY
-                    first_para.space_after = Pt(5)
-                    first_para.text = ""  # reset
-
-                    # 🔑 Enable bullet for this paragraph
-                    first_para.bullet = True
-
-                    tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', first_content)
-                    for token in tokens:
-                        run = first_para.add_run()
-                        if token.startswith("**") and token.endswith("**"):
-                            run.text = token[2:-2]
-                            run.font.bold = True
-                        elif token.startswith("*") and token.endswith("*"):
-                            run.text = token[1:-1]
-                            run.font.italic = True
-                        else:
-                            run.text = token
-                        run.font.name = "Calibri"
-                        run.font.size = Pt(22)
-                        run.font.color.rgb = RGBColor(0, 0, 0)
-
-                    # Remaining items
-                    for content_text in content_items[1:]:
-                        new_para = tf.add_paragraph()
-                        new_para.level = original_level
-                        new_para.alignment = PP_PARAGRAPH_ALIGNMENT.JUSTIFY
-                        new_para.space_after = Pt(5)
-
-                        # 🔑 Enable bullet
-                        new_para.bullet = True
-
-                        tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', content_text)
-                        for token in tokens:
-                            run = new_para.add_run()
-                            if token.startswith("**") and token.endswith("**"):
-                                run.text = token[2:-2]
-                                run.font.bold = True
-                            elif token.startswith("*") and token.endswith("*"):
-                                run.text = token[1:-1]
-                                run.font.italic = True
-                            else:
-                                run.text = token
-                            run.font.name = "Calibri"
-                            run.font.size = Pt(22)
-                            run.font.color.rgb = RGBColor(0, 0, 0)
-
-
-            continue 
-
-        # Normal placeholder processing for other placeholders
-
-        # Check if this text frame contains the {content} placeholder
-        content_placeholder_found = False
-        for para in shape.text_frame.paragraphs:
-            for run in para.runs:
-                if run.text.strip() == "{content}":
-                    content_placeholder_found = True
-                    break
-            if content_placeholder_found:
-                break
-        
-        if content_placeholder_found and "content" in data:
-            # Handle content replacement specially to maintain bullet formatting
-            tf = shape.text_frame
-            # tf.clear()
-            tf.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-
-            
-            # Get the original bullet formatting from the first paragraph
-            first_para = tf.paragraphs[0] if tf.paragraphs else tf.add_paragraph()
-            original_level = first_para.level
-            
-            # Clear all paragraphs except the first one
-            for i in range(len(tf.paragraphs) - 1, 0, -1):
-                tf.paragraphs[i]._element.getparent().remove(tf.paragraphs[i]._element)
-            
-            # Clear the first paragraph's text but keep its formatting
-            first_para.clear()
-            
-            # Process content - treat each content item as a separate bullet point
-            if data["content"]:
-                content_items = []
-                
-                # Flatten content structure - each main text becomes a bullet point
-                for item in data["content"]:
-                    if isinstance(item, dict):
-                        main_text = item.get("text", "")
-                        if main_text:
-                            add_bulleted_paragraph(tf, main_text, level=0)
-
-                            # content_items.append(main_text)
-                        # Add subpoints as separate items with increased indentation
-                        for sub in item.get("subpoints", []):
-                            add_bulleted_paragraph(tf, sub, level=1)
-
-                        # content_items.extend(subpoints)
-                    else:
-                        # Handle simple string items
-                        add_bulleted_paragraph(tf, str(item), level=0)
-
-                        # content_items.append(str(item))
-                
-                # Add first content item to the existing first paragraph
-                if content_items:
-                    first_content = content_items[0]
-                    tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', first_content)
-                    for token in tokens:
-                        run = first_para.add_run()
-                        if token.startswith("**") and token.endswith("**"):
-                            run.text = token[2:-2]
-                            run.font.bold = True
-                        elif token.startswith("*") and token.endswith("*"):
-                            run.text = token[1:-1]
-                            run.font.italic = True
-                        else:
-                            run.text = token
-                        run.font.name = "Calibri"
-                        run.font.size = Pt(22)
-                        run.font.color.rgb = RGBColor(0, 0, 0)
-                    
-                    # Set the original level for first paragraph
-                    first_para.level = original_level
-                    
-                    # Add remaining content items as new paragraphs with same formatting
-                    for content_text in content_items[1:]:
-                        new_para = tf.add_paragraph()
-                        new_para.level = original_level
-                        new_para.alignment = PP_PARAGRAPH_ALIGNMENT.JUSTIFY
-                        new_para.space_after = Pt(5)
-                        
-                        tokens = re.split(r'(\*\*.*?\*\*|\*.*?\*)', content_text)
-                        for token in tokens:
-                            run = new_para.add_run()
-                            if token.startswith("**") and token.endswith("**"):
-                                run.text = token[2:-2]
-                                run.font.bold = True
-                            elif token.startswith("*") and token.endswith("*"):
-                                run.text = token[1:-1]
-                                run.font.italic = True
-                            else:
-                                run.text = token
-                            run.font.name = "Calibri"
-                            run.font.size = Pt(22)
-                            run.font.color.rgb = RGBColor(0, 0, 0)
-            
-            continue  # Skip the normal processing for this shape
-        
-        # Normal placeholder processing for other placeholders
-        for para in shape.text_frame.paragraphs:
-            for run in para.runs:
-                txt = run.text.strip()
-                print(">>", run.text)
-                print(">>", run.text)
+        paragraphs = shape.text_frame.paragraphs
+        for para_pos, run_pos, txt in entry["runs"]:
+            run = paragraphs[para_pos].runs[run_pos]
 
-                # --- Title ---
-                # --- Title ---
-                if txt == "{title}" and "title" in data:
+            # --- Title ---
+            if txt == "{title}":
+                if "title" in data:
                     run.text = data["title"]
 
-                if txt == "codetitle":
-                    if "code" in data and isinstance(data["code"], dict) and "title" in data["code"]:
-                        run.text = data["code"]["title"]
-                        run.font.bold = False
-                        run.font.name = "Calibri"
-                        run.font.size = Pt(24)
-                    else:
-                        run.text = ""
-
-                # --- Code ---
-                if txt == "{code}":
-                    if "code" in data and data["code"]:
-                        tf = shape.text_frame
-                        tf.clear()
-                        tf.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-                        p = tf.paragraphs[0] if tf.paragraphs else tf.add_paragraph()
-                        p.clear()
-                        run = p.add_run()
-                        # run.text = data["code"]
-                        if isinstance(data["code"], dict):
-                            run.text = data["code"].get("snippet", "")
-                        else:
-                            run.text = data["code"]
-                        run.font.name = "Consolas"
-                        run.font.size = Pt(14)
-                        run.font.color.rgb = RGBColor(0, 0, 0)
-                        # fill = shape.fill
-                        # fill.solid()
-                        # fill.fore_color.rgb = RGBColor(230, 230, 230)
-                        p.level = 0
-                    else:
-                        run.text = ""
-                        #  delete the placeholder shape
-                        sp = shape.element
-                        sp.getparent().remove(sp)
-
-                # --- Notes ---
-                if txt == "{notes}" and "notes" in data:
-                    if slide.has_notes_slide:
-                        slide.notes_slide.notes_text_frame.text = data["notes"]
-
-                from io import BytesIO
-                from PIL import Image
-                import base64, requests
-
-                if txt == "imageurl":
-                    # ✅ Check content character length first
-                    content_length = 0
-                    if "content" in data and data["content"]:
-                        if isinstance(data["content"], list):
-                            for item in data["content"]:
-                                if isinstance(item, dict):
-                                    content_length += len(item.get("text", "")) + sum(len(s) for s in item.get("subpoints", []))
-                                else:
-                                    content_length += len(str(item))
-                        else:
-                            content_length += len(str(data["content"]))
-                    print(f"Content length: {content_length}")
-                    if content_length >= 600:
-                        # 🚫 Too much content → skip image
-                        run.text = ""
-                        continue  # skip processing image
-                    if "image_url" in data:
-                        try:
-                            img_url = data["image_url"]
-
-                            if img_url.startswith("data:image"):  # Handle base64-encoded images
-                                base64_data = img_url.split(",")[1]
-                                image_stream = BytesIO(base64.b64decode(base64_data))
-                            else:  # Normal URL, fetch via requests
-                                response = requests.get(img_url)
-                                print(f"Image fetch status: {response.status_code}")
-                                if response.status_code == 200:
-                                    image_stream = BytesIO(response.content)
-                                else:
-                                    run.text = f"status code: {response.status_code} -> {img_url}"
-                                    image_stream = None
-
-                            if image_stream:
-                                # ✅ Ensure image is in a supported format
-                                try:
-                                    img = Image.open(image_stream)
-                                    if img.format not in ["PNG", "JPEG"]:
-                                        converted_stream = BytesIO()
-                                        img.convert("RGB").save(converted_stream, format="PNG")
-                                        converted_stream.seek(0)
-                                        image_stream = converted_stream
-                                except Exception as e:
-                                    print(f"⚠️ Error converting image: {e}")
-
-                                run.text = ""
-                                left, top, width, height = shape.left, shape.top, shape.width, shape.height
-                                slide.shapes.add_picture(image_stream, left, top, width=width, height=height)
-
-                                # remove original placeholder
-                                sp = shape.element
-                                sp.getparent().remove(sp)
-
-                        except Exception as e:
-                            print(f"⚠️ Could not add image: {e}")
-                            run.text = ""
-                    else:
-                        run.text = ""
+            elif txt == "codetitle":
+                if "code" in data and isinstance(data["code"], dict) and "title" in data["code"]:
+                    run.text = data["code"]["title"]
+                    run.font.bold = False
+                    run.font.name = "Calibri"
+                    run.font.size = Pt(24)
+                else:
+                    run.text = ""
 
+            # --- Code ---
+            elif txt == "{code}":
+                fill_code(shape, run, data)
 
-def split_code_into_chunks(code_str, max_lines=25):
-    """Split a code snippet into chunks of max_lines each."""
-    lines = code_str.splitlines()
-    chunks = []
-    for i in range(0, len(lines), max_lines):
-        chunk = "\n".join(lines[i:i+max_lines])
-        chunks.append(chunk)
-    return chunks
+            # --- Notes ---
+            elif txt == "{notes}":
+                if "notes" in data and slide.has_notes_slide:
+                    slide.notes_slide.notes_text_frame.text = data["notes"]
+
+            elif txt == "imageurl":
+                fill_image(slide, shape, run, data, images, report)
+
+
+def collect_image_urls(expanded_slides):
+    """Image URLs that the fill step will actually place, in plan order."""
+    urls = []
+    for slide_info in expanded_slides:
+        if slide_info["mode"] == "code":
+            continue
+        data = slide_info["data"]
+        img_url = data.get("image_url")
+        if isinstance(img_url, str) and img_url:
+            urls.append(img_url)
+    return urls
+
+def _matching_layout(slide, prs):
+    """The layout of prs at the same master/layout position as the slide's layout (same template)."""
+    layout = slide.slide_layout
+    if slide.part.package is prs.part.package:
+        return layout
+    source_prs = slide.part.package.presentation_part.presentation
+    for master_idx, master in enumerate(source_prs.slide_masters):
+        for layout_idx, candidate in enumerate(master.slide_layouts):
+            if candidate.part is layout.part:
+                if master_idx < len(prs.slide_masters) and layout_idx < len(prs.slide_masters[master_idx].slide_layouts):
+                    return prs.slide_masters[master_idx].slide_layouts[layout_idx]
+    by_name = prs.slide_layouts.get_by_name(layout.name)
+    if by_name is None:
+        raise ValueError(f"No layout like '{layout.name}' in the target presentation")
+    return by_name
+
+def _relate_image(part, blob, content_type, ext):
+    """
+    Relate part to an image with these bytes: the package's own copy if it
+    has one, else a new media part. The bytes are never decoded, so formats
+    PIL can't open (e.g. SVG) copy fine.
+    """
+    package = part.package
+    sha1 = hashlib.sha1(blob).hexdigest()
+    image_part = package._image_parts._find_by_sha1(sha1)
+    if image_part is None:
+        # _image_parts only holds ImageParts; media python-pptx loads as a
+        # plain Part (e.g. SVG) is matched here, comparing same-type parts only
+        image_part = next((p for p in package.iter_parts()
+                           if p.content_type == content_type and not isinstance(p, ImagePart)
+                           and hashlib.sha1(p.blob).hexdigest() == sha1), None)
+    if image_part is None:
+        image_part = ImagePart(package.next_image_partname(ext), content_type, package, blob)
+    return part.relate_to(image_part, RT.IMAGE)
+
+def _copy_slide_rels(slide, new_slide):
+    """Relate new_slide to the pictures and links slide uses; returns {old rId: new rId}."""
+    same_package = slide.part.package is new_slide.part.package
+    rIds = {}
+    for rId, rel in slide.part.rels.items():
+        if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue
+        if rel.is_external:
+            rIds[rId] = new_slide.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        elif rel.reltype == RT.IMAGE and same_package:
+            rIds[rId] = new_slide.part.relate_to(rel.target_part, rel.reltype)
+        elif rel.reltype == RT.IMAGE:
+            target = rel.target_part
+            rIds[rId] = _relate_image(new_slide.part, target.blob, target.content_type, target.partname.ext)
+        else:
+            raise ValueError(f"Cannot copy slide part related as {rel.reltype}")
+    return rIds
+
+def _remap_rIds(element, rIds):
+    if not rIds:
+        return element
+    r_ns = "{%s}" % nsuri("r")
+    for el in element.iter():
+        for attr, value in el.attrib.items():
+            if attr.startswith(r_ns) and value in rIds:
+                el.set(attr, rIds[value])
+    return element
+
+def _replace_slide_xml(slide, source_el):
+    """
+    Make slide's XML that of source_el (a p:sld element). The slide's own
+    cSld/spTree elements are kept, since slide.shapes is bound to them.
+    """
+    target_el = slide.element
+    cSld, spTree = target_el.cSld, target_el.cSld.spTree
+    for el, source, keep in ((target_el, source_el, cSld), (cSld, source_el.cSld, spTree), (spTree, source_el.cSld.spTree, None)):
+        for name, value in source.attrib.items():
+            el.set(name, value)
+        children = [keep if keep is not None and child.tag == keep.tag else child for child in source]
+        for child in list(el):
+            el.remove(child)
+        el.extend(children)
 
 def duplicate_slide(prs, slide):
-    """Duplicate a slide while excluding placeholders."""
-    slide_layout = slide.slide_layout
-    new_slide = prs.slides.add_slide(slide_layout)
+    """
+    Duplicate a slide while excluding placeholders.
+    The slide may come from another presentation of the same template.
+    """
+    new_slide = prs.slides.add_slide(_matching_layout(slide, prs))
 
     # remove placeholders
     for shape in list(new_slide.shapes):
@@ -469,16 +398,158 @@ def duplicate_slide(prs, slide):
             sp.getparent().remove(sp)
 
     # copy original shapes
+    rIds = _copy_slide_rels(slide, new_slide)
     for shape in slide.shapes:
-        new_el = deepcopy(shape.element)
+        new_el = _remap_rIds(deepcopy(shape.element), rIds)
         new_slide.shapes._spTree.insert_element_before(new_el, 'p:extLst')
 
     return new_slide
 
+def copy_slide(slide, prs):
+    """
+    Append an exact copy of a slide from another presentation of the same
+    template (e.g. a template slide) to prs: background, shape tree and
+    notes included. Pictures and links are re-related in prs; other
+    embedded parts (charts, media) are not supported.
+    """
+    new_slide = prs.slides.add_slide(_matching_layout(slide, prs))
+    rIds = _copy_slide_rels(slide, new_slide)
+
+    _replace_slide_xml(new_slide, _remap_rIds(deepcopy(slide.element), rIds))
+
+    if slide.has_notes_slide:
+        new_slide.notes_slide.notes_text_frame.text = slide.notes_slide.notes_text_frame.text
+    return new_slide
+
+# ------------------ Text Fit Planning ------------------ #
+CONTENT_LAYOUT_INDEX = 1   # 2nd slide in template
+CODE_LAYOUT_INDEX = 2      # 3rd slide in template
+_text_layouts = {}  # template sha256 -> TextFitLayout
+
+
+def _token_shape(slide, token):
+    for shape in slide.shapes:
+        if shape.has_text_frame and token in shape.text_frame.text:
+            return shape
+    return None
+
+
+def template_text_layout(template_path, prs):
+    """
+    TextFitLayout of a template, measured from its content and code slides:
+    text box widths and insets, outline level indents, the empty lead
+    paragraph fill_content keeps, the picture's top and the footer line
+    (the top of the lowest layout shapes) that text must stay above.
+    Geometry missing from the template falls back to DEFAULT_TEXT_LAYOUT.
+    """
+    template_sha256 = template_fingerprint(template_path)
+    text_layout = _text_layouts.get(template_sha256)
+    if text_layout is not None:
+        return text_layout
+
+    default = DEFAULT_TEXT_LAYOUT
+    slides = prs.slides
+    content_slide = slides[CONTENT_LAYOUT_INDEX] if len(slides) > CONTENT_LAYOUT_INDEX else None
+    code_slide = slides[CODE_LAYOUT_INDEX] if len(slides) > CODE_LAYOUT_INDEX else None
+    content_shape = content_slide and _token_shape(content_slide, "{content}")
+    if content_shape is None:
+        _text_layouts[template_sha256] = default
+        return default
+
+    # Footer line: the highest of the shapes in the bottom quarter of the slide
+    slide_height = prs.slide_height
+    bottom = min(
+        [shape.top for shape in list(content_slide.slide_layout.shapes) + list(content_slide.shapes)
+         if shape.top is not None and shape.top > slide_height * 3 // 4] or [slide_height]
+    )
+
+    tf = content_shape.text_frame
+    text_top = content_shape.top + tf.margin_top
+    text_bottom = bottom - tf.margin_bottom
+
+    # Outline indents and default size from the presentation's default text style
+    default_style = prs.part._element.find(f"{{{nsuri('p')}}}defaultTextStyle")
+    level_indents, default_size = {}, 1800
+    for level in range(2):
+        lvl_pPr = default_style.find(f"{{{nsuri('a')}}}lvl{level + 1}pPr") if default_style is not None else None
+        level_indents[level] = int(lvl_pPr.get("marL", 0)) if lvl_pPr is not None else default.level_indents[level]
+        if level == 0 and lvl_pPr is not None:
+            defRPr = lvl_pPr.find(f"{{{nsuri('a')}}}defRPr")
+            if defRPr is not None and defRPr.get("sz"):
+                default_size = int(defRPr.get("sz"))
+
+    # fill_content empties the first paragraph but keeps its line spacing
+    line_spacing = tf.paragraphs[0].line_spacing
+    lead = TextMeasurer(BULLET_FONT[0], default_size / 100, line_spacing if isinstance(line_spacing, float) else 1.0)
+
+    image_shape = _token_shape(content_slide, "imageurl")
+    image_bottom = image_shape.top - tf.margin_bottom if image_shape is not None else text_bottom
+
+    code_shape = code_slide and _token_shape(code_slide, "{code}")
+    if code_shape is not None:
+        code_tf = code_shape.text_frame
+        code_width = code_shape.width - code_tf.margin_left - code_tf.margin_right
+        code_height = bottom - code_shape.top - code_tf.margin_top - code_tf.margin_bottom
+    else:
+        code_width, code_height = default.code_width, default.code_height
+
+    text_layout = TextFitLayout(
+        content_width=content_shape.width - tf.margin_left - tf.margin_right,
+        content_height=text_bottom - text_top,
+        image_content_height=image_bottom - text_top,
+        level_indents=level_indents,
+        code_width=code_width,
+        code_height=code_height,
+        lead_height=lead.line_height,
+        bullet_font=BULLET_FONT,
+        bullet_space_after=int(Pt(BULLET_SPACE_AFTER_PT)),
+        code_font=CODE_FONT,
+    )
+    _text_layouts[template_sha256] = text_layout
+    return text_layout
+
+
+def content_groups(content_items):
+    """Bullet groups as text_layout measures them: [(segments, level), ...] per item, as fill_content writes them."""
+    groups = []
+    for item in content_items:
+        if isinstance(item, dict):
+            paragraphs = [(item.get("text", ""), 0)] if item.get("text", "") else []
+            paragraphs += [(sub, 1) for sub in item.get("subpoints", [])]
+        else:
+            paragraphs = [(str(item), 0)]
+        groups.append([
+            ([(run_text, bold) for run_text, bold, _ in tokenize_inline_markup(text)] if "*" in text
+             else [(text, False)], level)
+            for text, level in paragraphs
+        ])
+    return groups
+
+
+def fit_content_chunks(content_items, text_layout=None, with_image=False):
+    """
+    Split content into chunks that each fit one slide's bullet box, by the
+    measured height of the wrapped text. Keeps main bullet + subpoints together.
+    Returns (chunks, image_fits): whether the picture fits under the last chunk.
+    """
+    text_layout = text_layout or DEFAULT_TEXT_LAYOUT
+    heights = text_layout.measure_groups(content_groups(content_items))
+    ranges, image_fits = text_layout.split_content(heights, with_image)
+    return [content_items[start:end] for start, end in ranges], image_fits
+
+
+def fit_code_chunks(code_str, text_layout=None):
+    """Split a code snippet into chunks that fit the code box once long lines wrap."""
+    lines = code_str.splitlines()
+    ranges = (text_layout or DEFAULT_TEXT_LAYOUT).split_code(lines)
+    return ["\n".join(lines[start:end]) for start, end in ranges]
+
+
 def chunk_content(content_items, max_chars=600):
     """
     Split content into chunks where each chunk has <= max_chars characters.
     Preserves main bullet + subpoints grouping.
+    Kept for existing callers; plan_slides() splits by measured height (fit_content_chunks).
     """
     chunks = []
     current_chunk = []
@@ -486,28 +557,18 @@ def chunk_content(content_items, max_chars=600):
 
     for item in content_items:
         if isinstance(item, dict):
-            main_text = item.get("text", "")
-            subpoints = item.get("subpoints", [])
-            group_len = len(main_text) + sum(len(s) for s in subpoints)
-
-            # If adding this group would exceed limit → start new chunk
-            if current_len + group_len > max_chars and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = []
-                current_len = 0
-
-            current_chunk.append(item)
-            current_len += group_len
-
+            item_len = len(item.get("text", "")) + sum(len(s) for s in item.get("subpoints", []))
         else:
             item_len = len(str(item))
-            if current_len + item_len > max_chars and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = []
-                current_len = 0
 
-            current_chunk.append(item)
-            current_len += item_len
+        # If adding this item would exceed limit → start new chunk
+        if current_len + item_len > max_chars and current_chunk:
+            chunks.append(current_chunk)
+            current_chunk = []
+            current_len = 0
+
+        current_chunk.append(item)
+        current_len += item_len
 
     if current_chunk:
         chunks.append(current_chunk)
@@ -515,179 +576,475 @@ def chunk_content(content_items, max_chars=600):
     return chunks
 
 
-def build_ppt(template_path, slides_json, output_path, temp_path):
-    prs1 = Presentation(template_path)
+def split_code_into_chunks(code_str, max_lines=25):
+    """
+    Split a code snippet into chunks of max_lines each.
+    Kept for existing callers; plan_slides() splits by wrapped height (fit_code_chunks).
+    """
+    lines = code_str.splitlines()
+    return ["\n".join(lines[i:i + max_lines]) for i in range(0, len(lines), max_lines)]
+
+
+def plan_slides(slides_json, text_layout=None):
+    """
+    Expand slide JSON into the list of slides to render.
+    Content is split where the wrapped bullets would run past the slide
+    footer and long code is split into parts, so one input slide may produce
+    several entries of {"layout", "data", "mode"}. A slide's picture goes on
+    its last content slide when it fits under the text there, else it is left out.
+    text_layout: template_text_layout() of the template; DEFAULT_TEXT_LAYOUT if omitted.
+    """
+    text_layout = text_layout or DEFAULT_TEXT_LAYOUT
 
-    # Step 1: Define layouts (assuming index 1 = content, 2 = code)
-    content_layout_index = 1   # 2nd slide in template
-    code_layout_index = 2      # 3rd slide in template
+    # Measure every bullet group of the deck in one batch (shared word-width memo)
+    groups = [content_groups(slide_data["content"]) if slide_data.get("content") else []
+              for slide_data in slides_json]
+    heights = text_layout.measure_groups([group for slide_groups in groups for group in slide_groups])
 
-    # Step 2: Build expanded slide plan
     expanded_slides = []
-    for slide_data in slides_json:
+    offset = 0
+    for slide_data, slide_groups in zip(slides_json, groups):
+        slide_heights = heights[offset:offset + len(slide_groups)]
+        offset += len(slide_groups)
         has_image = "image_url" in slide_data and slide_data["image_url"]
-        if "code" in slide_data and slide_data["code"]:
-            # Split code into chunks of 25 lines
-            code_chunks = split_code_into_chunks(slide_data["code"]["snippet"], max_lines=25)
-
-            # if "content" in slide_data and slide_data["content"]:
-            #     content_chunks = chunk_content(slide_data["content"], max_chars=600)
-            #     print(f"Content chunks: {len(content_chunks)}")
-            #     for idx, chunk in enumerate(content_chunks):
-            #         chunk_data = dict(slide_data)
-            #         chunk_data["content"] = chunk
-            #         total_chars = sum(len(item.get("text", "")) + sum(len(s) for s in item.get("subpoints", [])) 
-            #                       if isinstance(item, dict) else len(str(item)) 
-            #                       for item in chunk)
-            #         expanded_slides.append({"layout": content_layout_index, "data": chunk_data, "mode": "content"})
-            #         print(f"Total chars in chunk11: {total_chars}")
-            #         if has_image and total_chars >= 600:
-            #             # append content slide without image first remove image
-            #             expanded_slides.append({"layout": content_layout_index, "data": {"title": slide_data["title"], "image_url": slide_data["image_url"]}, "mode": "image"})
-
-            #         # if has_image and idx+1 == len(content_chunks):
-            #         #     expanded_slides.append({"layout": content_layout_index, "data": {"title": slide_data["title"], "image_url": slide_data["image_url"]}, "mode": "image"})
-            #         print(expanded_slides)
-
-            # else:
-            #     expanded_slides.append({"layout": content_layout_index, "data": slide_data, "mode": "content"})
-
-            if "content" in slide_data and slide_data["content"]:
-                content_chunks = chunk_content(slide_data["content"], max_chars=600)
-                print(f"Content chunks: {len(content_chunks)}")
-
-                for idx, chunk in enumerate(content_chunks):
-                    chunk_data = dict(slide_data)
-                    chunk_data["content"] = chunk
-
-                    total_chars = sum(
-                        len(item.get("text", "")) + sum(len(s) for s in item.get("subpoints", []))
-                        if isinstance(item, dict) else len(str(item))
-                        for item in chunk
-                    )
-
-                    # 👉 If it's the 2nd slide and image exists → include image in same slide
-                    if has_image and idx == len(content_chunks) - 1:
-                        chunk_data["image_url"] = slide_data["image_url"]
-                    else:
-                        chunk_data.pop("image_url", None)  # Ensure no image
-
-                    expanded_slides.append({
-                        "layout": content_layout_index,
-                        "data": chunk_data,
-                        "mode": "content"
-                    })
-
-                    print(f"✅ Added slide {idx+1}, chars={total_chars}, "
-                        f"with image={'yes' if 'image_url' in chunk_data else 'no'}")
-            else:
-                expanded_slides.append({"layout": content_layout_index, "data": slide_data, "mode": "content"})
 
+        if slide_groups:
+            ranges, image_fits = text_layout.split_content(slide_heights, bool(has_image))
+            logger.debug("Content chunks: %d", len(ranges))
+            for idx, (start, end) in enumerate(ranges):
+                chunk_data = dict(slide_data)
+                chunk_data["content"] = slide_data["content"][start:end]
+
+                # The picture goes under the text of the last chunk, if it fits there
+                if has_image and image_fits and idx == len(ranges) - 1:
+                    chunk_data["image_url"] = slide_data["image_url"]
+                else:
+                    chunk_data.pop("image_url", None)
 
+                expanded_slides.append({"layout": CONTENT_LAYOUT_INDEX, "data": chunk_data, "mode": "content"})
+                logger.debug("Added slide %d, height=%d EMU, with image=%s",
+                             idx + 1, sum(slide_heights[start:end]), "yes" if "image_url" in chunk_data else "no")
+        else:
+            expanded_slides.append({"layout": CONTENT_LAYOUT_INDEX, "data": slide_data, "mode": "content"})
 
-            # Then: one slide per code chunk
+        # Then: one slide per code chunk
+        if "code" in slide_data and slide_data["code"]:
+            code_chunks = fit_code_chunks(slide_data["code"]["snippet"], text_layout)
             for idx, chunk in enumerate(code_chunks):
                 chunk_data = dict(slide_data)
                 chunk_data["code"] = {
                     "title": slide_data["code"]["title"] + (f" (Part {idx+1})" if len(code_chunks) > 1 else ""),
                     "snippet": chunk
                 }
-                expanded_slides.append({"layout": code_layout_index, "data": chunk_data, "mode": "code"})
+                expanded_slides.append({"layout": CODE_LAYOUT_INDEX, "data": chunk_data, "mode": "code"})
+
+    return expanded_slides
+
+
+@contextmanager
+def timed_stage(timings, stage):
+    """Add the wall time of the enclosed block to timings[stage] (seconds)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def new_image_report():
+    return {"images": 0, "bytes_before": 0, "bytes_after": 0}
+
+
+def slide_render_data(slide_info):
+    """The placeholder data a planned slide is filled with."""
+    if slide_info["mode"] == "code":
+        return {
+            "title": "Example: " + slide_info["data"]["title"],
+            "content": [],
+            "code": slide_info["data"]["code"],
+            "notes": slide_info["data"].get("notes", "")
+        }
+    if slide_info["mode"] == "image":
+        return {
+            "title": slide_info["data"]["title"],
+            "content": [],
+            "image_url": slide_info["data"]["image_url"]
+        }
+    content_data = dict(slide_info["data"])
+    content_data["code"] = ""   # 🚫 clear code for non-code slides
+    return content_data
+
+
+def source_slide_index(idx, slide_info, template_slide_count):
+    """Template slide output slide idx is rendered from: filled in place for the first ones, else its layout."""
+    return idx if idx < template_slide_count else slide_info["layout"]
+
+
+# ------------------ Slide Cache ------------------ #
+def capture_slide(slide):
+    """A filled slide as a slide_cache entry; None if it relates parts the cache can't hold."""
+    rels = []
+    for rId, rel in slide.part.rels.items():
+        if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+            continue
+        if rel.is_external:
+            rels.append({"rId": rId, "reltype": rel.reltype, "target": rel.target_ref})
+        elif rel.reltype == RT.IMAGE:
+            target = rel.target_part
+            rels.append({"rId": rId, "reltype": rel.reltype, "blob": target.blob,
+                         "content_type": target.content_type, "ext": target.partname.ext})
         else:
-            # expanded_slides.append({"layout": content_layout_index, "data": slide_data, "mode": "content"})
-            # --- Pure content slides ---
-            # if "content" in slide_data and slide_data["content"]:
-            #     content_chunks = chunk_content(slide_data["content"], max_chars=600)
-            #     print(f"Content chunks: {len(content_chunks)}")
-            #     for idx, chunk in enumerate(content_chunks):
-            #         chunk_data = dict(slide_data)
-            #         chunk_data["content"] = chunk
-            #         total_chars = sum(len(item.get("text", "")) + sum(len(s) for s in item.get("subpoints", [])) 
-            #                       if isinstance(item, dict) else len(str(item)) 
-            #                       for item in chunk)
-            #         expanded_slides.append({"layout": content_layout_index, "data": chunk_data, "mode": "content"})
-            #         print(f"Total chars in chunk: {total_chars}")
-            #         if has_image and total_chars >= 600:
-            #             expanded_slides.append({"layout": content_layout_index, "data": chunk_data, "mode": "content"})
-            #         if has_image and idx+1 == len(content_chunks):
-            #             expanded_slides.append({"layout": content_layout_index, "data": {"title": slide_data["title"], "image_url": slide_data["image_url"]}, "mode": "image"})
-
-            # else:
-            #     expanded_slides.append({"layout": content_layout_index, "data": slide_data, "mode": "content"})
-            if "content" in slide_data and slide_data["content"]:
-                content_chunks = chunk_content(slide_data["content"], max_chars=600)
-                print(f"Content chunks: {len(content_chunks)}")
-
-                for idx, chunk in enumerate(content_chunks):
-                    chunk_data = dict(slide_data)
-                    chunk_data["content"] = chunk
-
-                    total_chars = sum(
-                        len(item.get("text", "")) + sum(len(s) for s in item.get("subpoints", []))
-                        if isinstance(item, dict) else len(str(item))
-                        for item in chunk
-                    )
-
-                    # 👉 If it's the 2nd slide and image exists → include image in same slide
-                    print(has_image, idx)
-                    if has_image and idx == len(content_chunks) - 1:
-                        chunk_data["image_url"] = slide_data["image_url"]
-                    else:
-                        print(chunk_data)
-                        chunk_data.pop("image_url", None)  # remove image_url if not needed
-
-                    expanded_slides.append({
-                        "layout": content_layout_index,
-                        "data": chunk_data,
-                        "mode": "content"
-                    })
-
-                    print(f"✅ Added slide {idx+1}, chars={total_chars}, "
-                        f"with image={'yes' if 'image_url' in chunk_data else 'no'}")
+            return None
+    notes = slide.notes_slide.notes_text_frame.text if slide.has_notes_slide else None
+    return {"xml": etree.tostring(slide.element), "notes": notes, "rels": rels}
 
-            else:
-                expanded_slides.append({"layout": content_layout_index, "data": slide_data, "mode": "content"})
-        # check for no. on characters in content objects within each slide
 
-       
-    # Step 3: Ensure enough slides exist by duplicating the right layout
-    template_slide_count = len(prs1.slides)
-    for idx in range(len(expanded_slides)):
-        if idx >= template_slide_count:
-            layout_index = expanded_slides[idx]["layout"]
-            duplicate_slide(prs1, prs1.slides[layout_index])
+def restore_slide(slide, entry):
+    """
+    Turn a slide of the right layout into the cached rendered slide. A
+    template slide restored in place keeps the relationships the cached
+    slide also has and loses the rest, so no stale pictures or links remain.
+    """
+    stale = [rId for rId, rel in slide.part.rels.items() if rel.reltype not in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE)]
+    rIds = {}
+    for rel in entry["rels"]:
+        if "target" in rel:
+            rIds[rel["rId"]] = slide.part.relate_to(rel["target"], rel["reltype"], is_external=True)
+        else:
+            rIds[rel["rId"]] = _relate_image(slide.part, rel["blob"], rel["content_type"], rel["ext"])
+    # Dropped only now, so media the slide already showed was matched above, not re-added
+    kept = set(rIds.values())
+    for rId in stale:
+        if rId not in kept:
+            slide.part.rels.pop(rId)
+    _replace_slide_xml(slide, _remap_rIds(parse_xml(entry["xml"]), rIds))
+    if entry["notes"] is not None:
+        slide.notes_slide.notes_text_frame.text = entry["notes"]
+
+
+def lookup_cached_slides(template_path, slide_keys):
+    """
+    Slide cache keys for the planned slides' render keys, and the entries
+    already cached as {slide index: entry}. (None, {}) when the cache is off.
+    """
+    if slide_cache is None:
+        return None, {}
+    template_sha256 = template_fingerprint(template_path)
+    slide_cache.use_template(template_path, template_sha256)
+    cache_keys = [slide_cache.key_for(template_sha256, key) for key in slide_keys]
+    cached = {}
+    for idx, key in enumerate(cache_keys):
+        entry = slide_cache.get(key)
+        if entry is not None:
+            cached[idx] = entry
+    return cache_keys, cached
+
+
+def _cacheable(slide_info, images):
+    """A slide whose image failed to load isn't cached; a later build may get the image."""
+    data = slide_render_data(slide_info)
+    if not data.get("image_url"):
+        return True
+    return bool(images and (images.get(data["image_url"]) or {}).get("data"))
+
+
+_A_T = "{%s}t" % nsuri("a")
+
+def _normalize_empty_runs(slide):
+    """
+    Store emptied run text as <a:t/>, the way a slide parsed back from the
+    slide cache has it, so cached and freshly filled slides save to the same
+    bytes (and stored decks get the same content hash).
+    """
+    for t in slide.element.iter(_A_T):
+        if t.text == "":
+            t.text = None
+
+
+def render_slide(slide, slide_info, placeholder_index, images=None, report=None, cached_entry=None, cache_key=None):
+    """
+    Fill one planned slide: restored from cached_entry when given, else
+    filled from its data and, with a cache_key, added to the slide cache.
+    """
+    if cached_entry is not None:
+        restore_slide(slide, cached_entry)
+        return
+    replace_placeholders(slide, slide_render_data(slide_info), images, report, placeholder_index)
+    _normalize_empty_runs(slide)
+    if cache_key is not None and slide_cache is not None and _cacheable(slide_info, images):
+        entry = capture_slide(slide)
+        if entry is not None:
+            slide_cache.put(cache_key, entry)
+
+
+def fill_slides(prs, expanded_slides, images=None, report=None, progress=None, timings=None,
+                cached=None, cache_keys=None):
+    """
+    Duplicate template slides as needed and fill them from the slide plan.
+    images: prefetched {url: resolved image}; with it, filling makes no network calls.
+    report: optional dict from new_image_report() collecting image sizes.
+    progress: optional callback(done, total) called after each filled slide.
+    timings: optional dict receiving "slide_duplication"/"placeholder_fill" seconds.
+    cached / cache_keys: from lookup_cached_slides(); cached slides are
+    restored instead of filled, and newly filled ones are cached.
+    """
+    if timings is None:
+        timings = {}
+    cached = cached or {}
 
-    prs1.save(temp_path)
-    prs = Presentation(temp_path)
+    # Step 3: Ensure enough slides exist by duplicating the right layout
+    with timed_stage(timings, "slide_duplication"):
+        template_slide_count = len(prs.slides)
+        # Placeholder locations of each template slide, compiled once per deck
+        placeholder_indexes = [compile_placeholder_index(slide) for slide in prs.slides]
+        for idx in range(len(expanded_slides)):
+            if idx >= template_slide_count:
+                layout_index = expanded_slides[idx]["layout"]
+                if idx in cached:
+                    # Restored from the slide cache, no need to copy the template's shapes
+                    prs.slides.add_slide(prs.slides[layout_index].slide_layout)
+                else:
+                    duplicate_slide(prs, prs.slides[layout_index])
 
     # Step 4: Fill slides
-    for idx, slide_info in enumerate(expanded_slides):
-        slide = prs.slides[idx]
-        if slide_info["mode"] == "code":
-            code_data = {
-                "title": "Example: " + slide_info["data"]["title"],
-                "content": [],
-                "code": slide_info["data"]["code"],
-                "notes": slide_info["data"].get("notes", "")
-            }
-            replace_placeholders(slide, code_data)
-        elif slide_info["mode"] == "image":
-            image_data = {
-                "title": slide_info["data"]["title"],
-                "content": [],
-                "image_url": slide_info["data"]["image_url"]
-            }
-            replace_placeholders(slide, image_data)
-        else:
-            content_data = dict(slide_info["data"])
-            content_data["code"] = ""   # 🚫 clear code for non-code slides
-            replace_placeholders(slide, content_data)
+    with timed_stage(timings, "placeholder_fill"):
+        for idx, slide_info in enumerate(expanded_slides):
+            source = source_slide_index(idx, slide_info, template_slide_count)
+            render_slide(prs.slides[idx], slide_info, placeholder_indexes[source], images, report,
+                         cached.get(idx), cache_keys[idx] if cache_keys else None)
+            if progress:
+                progress(idx + 1, len(expanded_slides))
+
 
-    prs.save(output_path)
-    print(f"✅ Final PPT created: {output_path}")
+# ------------------ Render State ------------------ #
+# Stored with each deck (GridFS metadata) so an edited deck can be rebuilt
+# incrementally: one key per output slide, equal keys render identical slides.
+RENDER_STATE_VERSION = 3   # bumped when planning or filling renders the same data differently
+
+def slide_render_key(source, in_place, slide_info):
+    """
+    Hash of everything an output slide's rendering depends on. in_place: the
+    template slide itself is filled rather than a duplicate of it;
+    slide_info None: an unfilled template slide.
+    """
+    payload = {"version": RENDER_STATE_VERSION, "source": source, "in_place": in_place}
+    if slide_info is not None:
+        payload["mode"] = slide_info["mode"]
+        payload["data"] = slide_render_data(slide_info)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def plan_render_keys(expanded_slides, template_slide_count):
+    """Render key per output slide; template slides the plan doesn't fill stay in the deck as-is."""
+    keys = []
+    for idx in range(max(len(expanded_slides), template_slide_count)):
+        slide_info = expanded_slides[idx] if idx < len(expanded_slides) else None
+        source = idx if slide_info is None else source_slide_index(idx, slide_info, template_slide_count)
+        keys.append(slide_render_key(source, idx < template_slide_count, slide_info))
+    return keys
+
+
+def new_render_state(template_path, slides_json, slide_keys):
+    return {
+        "version": RENDER_STATE_VERSION,
+        "template_sha256": template_fingerprint(template_path),
+        "slides_json": slides_json,
+        "slide_keys": slide_keys,
+    }
+
+
+def build_ppt_to_stream(template_path, slides_json, progress=None):
+    """
+    Build a PPT entirely in memory.
+    Returns a dict with the BytesIO "stream" (rewound to 0), "slides_count",
+    "size_bytes" and "image_report" (embedded images and bytes saved by
+    resizing). The deck itself never touches disk, so concurrent builds
+    cannot clobber each other's files; only the image and slide caches
+    write to their own directories.
+    "timings" holds the seconds spent per stage (plan, image_fetch,
+    template_load, slide_duplication, placeholder_fill, zip_save).
+    "render_state" is what update_ppt_stream needs to rebuild the deck
+    incrementally; store it alongside the deck.
+    "slide_cache" counts slides restored from / rendered past the slide cache.
+    progress: optional callback(stage, percent) for job status reporting.
+    """
+    def report_progress(stage, percent):
+        if progress:
+            progress(stage, percent)
+
+    timings = {}
+    report_progress("planning", 0)
+    with timed_stage(timings, "template_load"):
+        prs = get_template(template_path)
+    with timed_stage(timings, "plan"):
+        expanded_slides = plan_slides(slides_json, template_text_layout(template_path, prs))
+    slide_keys = plan_render_keys(expanded_slides, len(prs.slides))
+    with timed_stage(timings, "slide_cache"):
+        cache_keys, cached = lookup_cached_slides(template_path, slide_keys[:len(expanded_slides)])
+
+    # Cached slides already hold their pictures
+    report_progress("image_fetch", 5)
+    with timed_stage(timings, "image_fetch"):
+        images = prefetch_images(collect_image_urls(
+            [slide for idx, slide in enumerate(expanded_slides) if idx not in cached]
+        ))
+
+    report_progress("fill", 30)
+    image_report = new_image_report()
+    fill_slides(prs, expanded_slides, images, image_report,
+                progress=lambda done, total: report_progress("fill", 30 + 55 * done // total),
+                timings=timings, cached=cached, cache_keys=cache_keys)
+    image_report["bytes_saved"] = image_report["bytes_before"] - image_report["bytes_after"]
+    logger.info("Images: %d embedded, %d KB saved by resizing", image_report["images"], image_report["bytes_saved"] // 1024)
+
+    report_progress("save", 85)
+    with timed_stage(timings, "zip_save"):
+        stream = BytesIO()
+        prs.save(stream)
+        stream.seek(0)
+    logger.debug("Build timings: %s", timings)
+    return {
+        "stream": stream,
+        "slides_count": len(prs.slides),
+        "size_bytes": stream.getbuffer().nbytes,
+        "image_report": image_report,
+        "timings": timings,
+        "render_state": new_render_state(template_path, slides_json, slide_keys),
+        "slide_cache": {"hits": len(cached), "misses": len(expanded_slides) - len(cached) if cache_keys else 0},
+    }
+
+
+def _full_rebuild(template_path, slides_json, progress, reason):
+    logger.info("Full rebuild: %s", reason)
+    result = build_ppt_to_stream(template_path, slides_json, progress)
+    result.update(rendered_slides=result["slides_count"], reused_slides=0)
+    return result
+
+
+def update_ppt_stream(template_path, deck, render_state, slides_json, progress=None):
+    """
+    Rebuild a stored deck for edited slide JSON, rendering only what changed.
+    deck: bytes or file-like of the deck built earlier; render_state: the
+    "render_state" saved with it. Output slides whose render key is
+    unchanged are kept from the old package (reordered, dropped as needed);
+    only new or edited slides are copied from the template and filled, and
+    only their images are fetched. Falls back to a full build when there is
+    no usable render state or the template changed since.
+    Same return value as build_ppt_to_stream, plus "rendered_slides" and "reused_slides".
+    """
+    def report_progress(stage, percent):
+        if progress:
+            progress(stage, percent)
+
+    if not render_state or render_state.get("version") != RENDER_STATE_VERSION:
+        return _full_rebuild(template_path, slides_json, progress, "deck has no render state")
+    if render_state["template_sha256"] != template_fingerprint(template_path):
+        return _full_rebuild(template_path, slides_json, progress, "template changed")
+
+    timings = {}
+    report_progress("planning", 0)
+    with timed_stage(timings, "template_load"):
+        template = get_template(template_path)
+        template_slide_count = len(template.slides)
+    with timed_stage(timings, "plan"):
+        expanded_slides = plan_slides(slides_json, template_text_layout(template_path, template))
+    slide_keys = plan_render_keys(expanded_slides, template_slide_count)
+
+    with timed_stage(timings, "deck_load"):
+        prs = Presentation(deck if hasattr(deck, "read") else BytesIO(deck))
+    sldIdLst = prs.slides._sldIdLst
+    if len(sldIdLst) != len(render_state["slide_keys"]):
+        return _full_rebuild(template_path, slides_json, progress, "deck does not match its render state")
+
+    # Old slides by key; the same key may appear more than once
+    reusable = {}
+    for sldId, key in zip(sldIdLst, render_state["slide_keys"]):
+        reusable.setdefault(key, []).append(sldId.rId)
+    order = [reusable[key].pop(0) if reusable.get(key) else None for key in slide_keys]
+    to_render = [idx for idx, rId in enumerate(order) if rId is None]
+
+    planned = [idx for idx in to_render if idx < len(expanded_slides)]
+    with timed_stage(timings, "slide_cache"):
+        cache_keys, found = lookup_cached_slides(template_path, [slide_keys[idx] for idx in planned])
+    cache_keys = dict(zip(planned, cache_keys)) if cache_keys else {}
+    cached = {planned[n]: entry for n, entry in found.items()}
+
+    report_progress("image_fetch", 5)
+    with timed_stage(timings, "image_fetch"):
+        images = prefetch_images(collect_image_urls([expanded_slides[idx] for idx in planned if idx not in cached]))
+
+    report_progress("fill", 30)
+    image_report = new_image_report()
+    with timed_stage(timings, "slide_duplication"):
+        placeholder_indexes = [compile_placeholder_index(slide) for slide in template.slides]
+        sources = {}
+        for idx in to_render:
+            if idx < template_slide_count:
+                # Mirrors build_ppt_to_stream: the first slides are the template slides themselves
+                sources[idx] = idx
+                copy_slide(template.slides[idx], prs)
+            else:
+                sources[idx] = expanded_slides[idx]["layout"]
+                duplicate_slide(prs, template.slides[sources[idx]])
+            order[idx] = sldIdLst[-1].rId
+
+    with timed_stage(timings, "placeholder_fill"):
+        for done, idx in enumerate(to_render, start=1):
+            if idx < len(expanded_slides):
+                render_slide(prs.part.related_slide(order[idx]), expanded_slides[idx],
+                             placeholder_indexes[sources[idx]], images, image_report,
+                             cached.get(idx), cache_keys.get(idx))
+            report_progress("fill", 30 + 55 * done // len(to_render))
+    image_report["bytes_saved"] = image_report["bytes_before"] - image_report["bytes_after"]
+
+    with timed_stage(timings, "reorder"):
+        sldIds = {sldId.rId: sldId for sldId in sldIdLst}
+        for sldId in list(sldIdLst):
+            sldIdLst.remove(sldId)
+        for rId, sldId in sldIds.items():
+            if rId not in order:
+                prs.part.drop_rel(rId)   # unreferenced slide parts are not saved
+        for rId in order:
+            sldIdLst.append(sldIds[rId])
+        prs.part.rename_slide_parts(order)
+
+    reused = len(order) - len(to_render)
+    logger.info("Incremental rebuild: %d slides rendered, %d reused", len(to_render), reused)
+
+    report_progress("save", 85)
+    with timed_stage(timings, "zip_save"):
+        stream = BytesIO()
+        prs.save(stream)
+        stream.seek(0)
+    logger.debug("Update timings: %s", timings)
+    return {
+        "stream": stream,
+        "slides_count": len(prs.slides),
+        "size_bytes": stream.getbuffer().nbytes,
+        "image_report": image_report,
+        "timings": timings,
+        "render_state": new_render_state(template_path, slides_json, slide_keys),
+        "slide_cache": {"hits": len(cached), "misses": len(planned) - len(cached) if cache_keys else 0},
+        "rendered_slides": len(to_render),
+        "reused_slides": reused,
+    }
+
+
+def build_ppt(template_path, slides_json, output_path, temp_path=None):
+    """
+    Build a PPT and write it to output_path.
+    temp_path is accepted for backwards compatibility and no longer used.
+    """
+    result = build_ppt_to_stream(template_path, slides_json)
+    with open(output_path, "wb") as f:
+        f.write(result["stream"].getbuffer())
+    logger.info("Final PPT created: %s", output_path)
+    return result
 
 
 
 # ------------------ Main ------------------ #
 if __name__ == "__main__":
-    build_ppt("template_iamneo.pptx", "slides.json", "Cloud_Trends_2025.pptx", "temp.pptx")
\ No newline at end of file
+    # For many decks at once use bulk_build.py
+    with open("slides.json", encoding="utf-8") as f:
+        build_ppt("template_iamneo.pptx", json.load(f)["slides"], "Cloud_Trends_2025.pptx", "temp.pptx")
\ No newline at end of file
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+# ------------------ Slide Cache Settings ------------------ #
+SLIDE_CACHE_ENABLED = os.getenv("SLIDE_CACHE_ENABLED", "1") == "1"
+SLIDE_CACHE_DIR = os.getenv("SLIDE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pptgen_slide_cache"))
+SLIDE_CACHE_MEMORY_BYTES = int(os.getenv("SLIDE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+SLIDE_CACHE_DISK_BYTES = int(os.getenv("SLIDE_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+ENTRY_FORMAT = "2"   # part of every key; bump when encoded entries change shape
+
+logger = logging.getLogger(__name__)
+
+
+def encode_entry(entry):
+    """
+    Serialize a rendered slide {"xml", "notes", "rels"} to bytes: a length-
+    prefixed JSON header followed by the slide XML and the media blobs.
+    """
+    blobs = [entry["xml"]] + [rel["blob"] for rel in entry["rels"] if "blob" in rel]
+    header = {
+        "notes": entry["notes"],
+        "rels": [{k: v for k, v in rel.items() if k != "blob"} for rel in entry["rels"]],
+        "sizes": [len(blob) for blob in blobs],
+    }
+    head = json.dumps(header).encode("utf-8")
+    return len(head).to_bytes(4, "big") + head + b"".join(blobs)
+
+
+def decode_entry(payload):
+    head_len = int.from_bytes(payload[:4], "big")
+    header = json.loads(payload[4:4 + head_len])
+    blobs, pos = [], 4 + head_len
+    for size in header["sizes"]:
+        blobs.append(payload[pos:pos + size])
+        pos += size
+    media = iter(blobs[1:])
+    rels = []
+    for rel in header["rels"]:
+        if "target" not in rel:
+            rel["blob"] = next(media)
+        rels.append(rel)
+    return {"xml": blobs[0], "notes": header["notes"], "rels": rels}
+
+
+class SlideCache:
+    """
+    Rendered slides shared across decks: slide XML plus its related media,
+    keyed by template, layout, mode and slide data (see key_for).
+
+    Two tiers: a byte-bounded in-memory LRU in front of an on-disk LRU under
+    cache_dir/<template sha256>/. Entries are written through to disk, so
+    build worker processes share them. When a template file changes, every
+    entry rendered from its old version is dropped from both tiers.
+    Disk errors never fail a build: reads miss and writes are skipped.
+    """
+
+    def __init__(self, cache_dir=SLIDE_CACHE_DIR, memory_bytes=SLIDE_CACHE_MEMORY_BYTES, disk_bytes=SLIDE_CACHE_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped_puts = 0
+        self._disk_error_logged = False
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> encoded entry, oldest first
+        self._memory_total = 0
+        self._disk_index = None  # OrderedDict key -> size, oldest first
+        self._disk_total = 0
+        self._templates = {}  # abs template path -> sha256 in use
+
+    @staticmethod
+    def key_for(template_sha256, render_key):
+        """render_key: pptgenerator.slide_render_key() of the slide (layout, mode, normalized data)."""
+        return f"{template_sha256[:16]}-{hashlib.sha256((ENTRY_FORMAT + template_sha256 + render_key).encode('utf-8')).hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key.split("-", 1)[0], key + ".slide")
+
+    # ------------------ Template Invalidation ------------------ #
+    def use_template(self, template_path, template_sha256):
+        """Note the template version a build uses; drops entries of a previous version of that file."""
+        path = os.path.abspath(template_path)
+        with self._lock:
+            previous = self._templates.get(path)
+            self._templates[path] = template_sha256
+            if previous is None or previous == template_sha256:
+                return
+            prefix = previous[:16]
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_total -= len(self._memory.pop(key))
+            if self._disk_index is not None:
+                for key in [k for k in self._disk_index if k.startswith(prefix)]:
+                    self._disk_total -= self._disk_index.pop(key)
+            shutil.rmtree(os.path.join(self.cache_dir, prefix), ignore_errors=True)
+        logger.info("Template changed, dropped cached slides: %s", path)
+
+    # ------------------ Lookups ------------------ #
+    def _disk_error(self, e):
+        if not self._disk_error_logged:
+            logger.warning("Slide cache disk unavailable, slides are rendered uncached: %s", e)
+            self._disk_error_logged = True
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file mtimes the first time the cache is used."""
+        if self._disk_index is not None:
+            return
+        entries = []
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for template_dir in os.listdir(self.cache_dir):
+                dir_path = os.path.join(self.cache_dir, template_dir)
+                if not os.path.isdir(dir_path):
+                    continue
+                for name in os.listdir(dir_path):
+                    if name.endswith(".slide"):
+                        try:
+                            st = os.stat(os.path.join(dir_path, name))
+                        except OSError:
+                            continue   # evicted by another process meanwhile
+                        entries.append((st.st_mtime, name[:-6], st.st_size))
+        except OSError as e:
+            self._disk_error(e)
+        entries.sort()
+        self._disk_index = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_total = sum(self._disk_index.values())
+        self._evict_disk()   # the bound may have been lowered since
+
+    def get(self, key):
+        """Return the cached slide entry, or None on a miss."""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return decode_entry(payload)
+
+            self._load_disk_index()
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    payload = f.read()
+                os.utime(path)
+            except OSError:
+                # Not cached, or evicted by another worker process
+                self._disk_total -= self._disk_index.pop(key, 0)
+                self.misses += 1
+                return None
+            if key not in self._disk_index:
+                self._disk_total += len(payload)
+            self._disk_index[key] = len(payload)
+            self._disk_index.move_to_end(key)
+            self._remember(key, payload)
+            self.hits += 1
+            self.disk_hits += 1
+        return decode_entry(payload)
+
+    def put(self, key, entry):
+        payload = encode_entry(entry)
+        if len(payload) > self.disk_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            self._load_disk_index()
+            # Write to a temp file first so other processes never read partial entries
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                self._disk_error(e)
+                self.skipped_puts += 1
+                return
+            self._disk_total -= self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(payload)
+            self._disk_total += len(payload)
+            self._evict_disk()
+            self._remember(key, payload)
+
+    def _remember(self, key, payload):
+        if len(payload) > self.memory_bytes:
+            return
+        self._memory_total -= len(self._memory.pop(key, b""))
+        self._memory[key] = payload
+        self._memory_total += len(payload)
+        # Entries leaving memory stay on disk
+        while self._memory_total > self.memory_bytes:
+            _, oldest = self._memory.popitem(last=False)
+            self._memory_total -= len(oldest)
+
+    def _evict_disk(self):
+        while self._disk_total > self.disk_bytes and self._disk_index:
+            oldest, size = self._disk_index.popitem(last=False)
+            self._disk_total -= size
+            self._memory_total -= len(self._memory.pop(oldest, b""))
+            try:
+                os.remove(self._path(oldest))
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "skipped_puts": self.skipped_puts,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_total,
+                "disk_entries": len(self._disk_index or {}),
+                "disk_bytes": self._disk_total,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_total = 0
+            self._disk_index = OrderedDict()
+            self._disk_total = 0
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+slide_cache = SlideCache() if SLIDE_CACHE_ENABLED else None
@@ -0,0 +1,482 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
+import certifi
+import gridfs
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ------------------ MongoDB Settings ------------------ #
+MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "ppt_database")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "60000"))
+
+# Decks are streamed to/from GridFS in chunks of this size (bytes)
+GRIDFS_CHUNK_SIZE = int(os.getenv("GRIDFS_CHUNK_SIZE", str(255 * 1024)))
+PPTX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+# Identical decks are stored once; re-uploads return the existing ppt_id
+PPT_DEDUP_ENABLED = os.getenv("PPT_DEDUP_ENABLED", "1") == "1"
+dedup_stats = {"hits": 0, "misses": 0, "bytes_saved": 0}
+_dedup_lock = threading.Lock()
+_dedup_index_ready = False
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Counts connection pool events (CMAP) for one client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "closed": 0, "checked_out": 0, "checked_in": 0, "checkout_failed": 0, "pool_cleared": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def connection_created(self, event):
+        self._count("created")
+
+    def connection_closed(self, event):
+        self._count("closed")
+
+    def connection_checked_out(self, event):
+        self._count("checked_out")
+
+    def connection_checked_in(self, event):
+        self._count("checked_in")
+
+    def connection_check_out_failed(self, event):
+        self._count("checkout_failed")
+
+    def pool_cleared(self, event):
+        self._count("pool_cleared")
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["open"] = stats["created"] - stats["closed"]
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        return stats
+
+
+sync_pool_stats = PoolStatsListener()
+async_pool_stats = PoolStatsListener()
+
+
+def _client_options(listener):
+    return {
+        "tlsCAFile": certifi.where(),
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "event_listeners": [listener],
+    }
+
+
+def get_client():
+    """The process-wide MongoClient, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(MONGODB_URI, **_client_options(sync_pool_stats))
+        return _client
+
+
+def get_db():
+    return get_client()[MONGODB_DB_NAME]
+
+
+def get_bucket():
+    return gridfs.GridFSBucket(get_db(), chunk_size_bytes=GRIDFS_CHUNK_SIZE)
+
+
+def get_async_client():
+    """
+    The process-wide AsyncMongoClient for async endpoints.
+    Create it from inside the app's event loop; it is bound to that loop.
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            _async_client = AsyncMongoClient(MONGODB_URI, **_client_options(async_pool_stats))
+        return _async_client
+
+
+def get_async_db():
+    return get_async_client()[MONGODB_DB_NAME]
+
+
+def get_async_bucket():
+    return gridfs.AsyncGridFSBucket(get_async_db(), chunk_size_bytes=GRIDFS_CHUNK_SIZE)
+
+
+def get_pool_stats():
+    """Connection pool counters for the sync and async clients (None if never created)."""
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "sync": sync_pool_stats.snapshot() if _client is not None else None,
+        "async": async_pool_stats.snapshot() if _async_client is not None else None,
+    }
+
+
+def close_clients():
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    if client is not None:
+        client.close()
+    return async_client
+
+
+async def close_clients_async():
+    async_client = close_clients()
+    if async_client is not None:
+        await async_client.close()
+
+
+# ------------------ Deck Hashing ------------------ #
+class _HashingReader:
+    """File-like wrapper that hashes bytes as GridFS reads them chunk by chunk."""
+
+    def __init__(self, source):
+        self._source = source
+        self.sha256 = hashlib.sha256()
+        self.length = 0
+
+    def read(self, size=-1):
+        data = self._source.read(size)
+        self.sha256.update(data)
+        self.length += len(data)
+        return data
+
+
+def deck_content_hash(source):
+    """
+    sha256 over the parts of a .pptx (names, sizes and uncompressed bytes).
+    Two saves of the same deck only differ in their zip timestamps, so this
+    is stable where a hash of the file bytes is not. source must be seekable;
+    it is rewound afterwards. Returns None if source is not a zip.
+    """
+    start = source.tell()
+    digest = hashlib.sha256()
+    try:
+        with zipfile.ZipFile(source) as zf:
+            for info in sorted(zf.infolist(), key=lambda i: i.filename):
+                digest.update(f"{info.filename}\0{info.file_size}\0".encode("utf-8"))
+                with zf.open(info) as member:
+                    for chunk in iter(lambda: member.read(64 * 1024), b""):
+                        digest.update(chunk)
+    except zipfile.BadZipFile:
+        return None
+    finally:
+        source.seek(start)
+    return digest.hexdigest()
+
+
+def _dedup_index_spec():
+    # Partial, so files stored before deduplication (no hash) don't collide
+    return {
+        "keys": "metadata.content_hash",
+        "unique": True,
+        "partialFilterExpression": {"metadata.content_hash": {"$exists": True}},
+    }
+
+
+def _count_dedup(hit, size_bytes=0):
+    with _dedup_lock:
+        if hit:
+            dedup_stats["hits"] += 1
+            dedup_stats["bytes_saved"] += size_bytes
+        else:
+            dedup_stats["misses"] += 1
+
+
+def get_dedup_stats():
+    with _dedup_lock:
+        stats = dict(dedup_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["enabled"] = PPT_DEDUP_ENABLED
+    return stats
+
+
+def _as_source(file_path):
+    """bytes / BytesIO / file object -> readable stream (None for paths)."""
+    if isinstance(file_path, (bytes, bytearray, memoryview)):
+        return BytesIO(file_path)   # shares a bytes object's buffer, no copy
+    if hasattr(file_path, "read"):
+        return file_path
+    return None
+
+
+def _content_hash_for(source):
+    if PPT_DEDUP_ENABLED and getattr(source, "seekable", lambda: False)():
+        return deck_content_hash(source)
+    return None
+
+
+def _upload_metadata(reader, content_hash, render_state=None):
+    metadata = {"contentType": PPTX_CONTENT_TYPE, "sha256": reader.sha256.hexdigest(), "size_bytes": reader.length}
+    if content_hash:
+        metadata["content_hash"] = content_hash
+    if render_state:
+        metadata["render"] = render_state
+    return metadata
+
+
+def _attach_render_filter(file_id):
+    # A deduplicated deck keeps the render state it was first stored with
+    return {"_id": file_id, "metadata.render": {"$exists": False}}
+
+
+# ------------------ Sync GridFS ------------------ #
+def _ensure_dedup_index():
+    global _dedup_index_ready
+    if not _dedup_index_ready:
+        spec = _dedup_index_spec()
+        get_db().fs.files.create_index(spec.pop("keys"), **spec)
+        _dedup_index_ready = True
+
+
+def _find_stored_deck(content_hash):
+    return get_db().fs.files.find_one({"metadata.content_hash": content_hash}, {"_id": 1, "length": 1, "filename": 1})
+
+
+def _stored_record(ppt_id, filename, deduplicated):
+    return {"ppt_id": ppt_id, "filename": filename, "deduplicated": deduplicated}
+
+
+def _reuse_stored_deck(existing, render_state):
+    _count_dedup(True, existing["length"])
+    if render_state:
+        get_db().fs.files.update_one(_attach_render_filter(existing["_id"]), {"$set": {"metadata.render": render_state}})
+    logger.info("Identical PPT already stored with ID: %s", existing["_id"])
+    return _stored_record(existing["_id"], existing.get("filename"), True)
+
+
+def store_ppt_in_mongodb(file_path, ppt_name: str, chunk_size=None, render_state=None):
+    """
+    Streams a PPT into MongoDB GridFS, chunk_size bytes at a time.
+    file_path may be a path on disk or an in-memory bytes / BytesIO deck;
+    it is never read into memory as a whole. The sha256 of the deck is
+    computed while streaming and stored in the file's metadata.
+    If a deck with the same content is already stored, its id is returned
+    and nothing is uploaded (see deck_content_hash / get_dedup_stats).
+    render_state: the build's "render_state", kept as metadata.render so
+    the deck can be rebuilt incrementally (see pptgenerator.update_ppt_stream).
+    """
+    return store_ppt_record(file_path, ppt_name, chunk_size, render_state)["ppt_id"]
+
+
+def store_ppt_record(file_path, ppt_name: str, chunk_size=None, render_state=None):
+    """
+    store_ppt_in_mongodb, returning {"ppt_id", "filename", "deduplicated"}.
+    A deduplicated deck keeps the file name it was first stored under, so
+    callers reporting a name should report this one, not ppt_name.
+    """
+    source = _as_source(file_path)
+    if source is None:
+        file_path_obj = Path(file_path)
+        if not file_path_obj.exists():
+            raise FileNotFoundError(f"{file_path} not found")
+        with open(file_path, "rb") as f:
+            return store_ppt_record(f, ppt_name, chunk_size, render_state)
+
+    content_hash = _content_hash_for(source)
+    if content_hash:
+        _ensure_dedup_index()
+        existing = _find_stored_deck(content_hash)
+        if existing:
+            return _reuse_stored_deck(existing, render_state)
+
+    reader = _HashingReader(source)
+    upload = get_bucket().open_upload_stream(ppt_name, chunk_size_bytes=chunk_size)
+    try:
+        upload.write(reader)
+        # Set before close() so it goes out with the files document
+        upload.metadata = _upload_metadata(reader, content_hash, render_state)
+        upload.close()
+    except gridfs.errors.FileExists:
+        # The new file's _id is fresh, so this is the content_hash index:
+        # another request stored the same deck while we were uploading
+        upload.abort()
+        existing = _find_stored_deck(content_hash)
+        if not existing:
+            raise
+        return _reuse_stored_deck(existing, render_state)
+    except BaseException:
+        upload.abort()
+        raise
+    if content_hash:
+        _count_dedup(False)
+    logger.info("Stored PPT in MongoDB with ID: %s", upload._id)
+    return _stored_record(upload._id, ppt_name, False)
+
+
+def open_ppt_download(file_id):
+    """Open a stored deck for streaming; the returned GridOut has .filename/.length."""
+    return get_bucket().open_download_stream(file_id)
+
+
+def iter_ppt_chunks(grid_out):
+    """
+    Yield a stored deck one GridFS chunk at a time, checking the sha256 from
+    store_ppt_in_mongodb once the last chunk has been read.
+    """
+    expected = (grid_out.metadata or {}).get("sha256")
+    digest = hashlib.sha256()
+    try:
+        # Iterating a GridOut yields lines, readchunk() yields whole chunks
+        while True:
+            chunk = grid_out.readchunk()
+            if not chunk:
+                break
+            digest.update(chunk)
+            yield chunk
+    finally:
+        grid_out.close()
+    if expected and digest.hexdigest() != expected:
+        raise IOError(f"Checksum mismatch for PPT {grid_out._id}")
+
+
+def get_ppt_from_mongodb(file_id, save_path):
+    with open(save_path, "wb") as f:
+        for chunk in iter_ppt_chunks(open_ppt_download(file_id)):
+            f.write(chunk)
+    logger.info("Retrieved PPT from MongoDB: %s", save_path)
+
+
+# ------------------ Async GridFS ------------------ #
+async def _ensure_dedup_index_async():
+    global _dedup_index_ready
+    if not _dedup_index_ready:
+        spec = _dedup_index_spec()
+        await get_async_db().fs.files.create_index(spec.pop("keys"), **spec)
+        _dedup_index_ready = True
+
+
+async def _find_stored_deck_async(content_hash):
+    return await get_async_db().fs.files.find_one({"metadata.content_hash": content_hash}, {"_id": 1, "length": 1, "filename": 1})
+
+
+async def _reuse_stored_deck_async(existing, render_state):
+    _count_dedup(True, existing["length"])
+    if render_state:
+        await get_async_db().fs.files.update_one(_attach_render_filter(existing["_id"]), {"$set": {"metadata.render": render_state}})
+    logger.info("Identical PPT already stored with ID: %s", existing["_id"])
+    return _stored_record(existing["_id"], existing.get("filename"), True)
+
+
+async def store_ppt_in_mongodb_async(file_path, ppt_name: str, chunk_size=None, render_state=None):
+    """
+    store_ppt_in_mongodb for async endpoints: same streaming, checksum and
+    deduplication, on the AsyncMongoClient so the event loop never blocks
+    on GridFS I/O. Paths are not accepted; pass bytes or a BytesIO deck.
+    """
+    return (await store_ppt_record_async(file_path, ppt_name, chunk_size, render_state))["ppt_id"]
+
+
+async def store_ppt_record_async(file_path, ppt_name: str, chunk_size=None, render_state=None):
+    """store_ppt_in_mongodb_async, returning {"ppt_id", "filename", "deduplicated"} like store_ppt_record."""
+    source = _as_source(file_path)
+    if source is None:
+        raise TypeError("store_ppt_in_mongodb_async expects bytes or a file-like deck")
+
+    # Unzipping a large deck is CPU work, keep it off the event loop
+    content_hash = await asyncio.to_thread(_content_hash_for, source)
+    if content_hash:
+        await _ensure_dedup_index_async()
+        existing = await _find_stored_deck_async(content_hash)
+        if existing:
+            return await _reuse_stored_deck_async(existing, render_state)
+
+    reader = _HashingReader(source)
+    upload = get_async_bucket().open_upload_stream(ppt_name, chunk_size_bytes=chunk_size)
+    try:
+        await upload.write(reader)
+        upload.metadata = _upload_metadata(reader, content_hash, render_state)
+        await upload.close()
+    except gridfs.errors.FileExists:
+        await upload.abort()
+        existing = await _find_stored_deck_async(content_hash)
+        if not existing:
+            raise
+        return await _reuse_stored_deck_async(existing, render_state)
+    except BaseException:
+        await upload.abort()
+        raise
+    if content_hash:
+        _count_dedup(False)
+    logger.info("Stored PPT in MongoDB with ID: %s", upload._id)
+    return _stored_record(upload._id, ppt_name, False)
+
+
+async def open_ppt_download_async(file_id):
+    return await get_async_bucket().open_download_stream(file_id)
+
+
+async def iter_ppt_chunks_async(grid_out):
+    """Async iter_ppt_chunks for an AsyncGridOut."""
+    expected = (grid_out.metadata or {}).get("sha256")
+    digest = hashlib.sha256()
+    try:
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            digest.update(chunk)
+            yield chunk
+    finally:
+        await grid_out.close()
+    if expected and digest.hexdigest() != expected:
+        raise IOError(f"Checksum mismatch for PPT {grid_out._id}")
+
+
+async def read_ppt_async(file_id):
+    """
+    A stored deck as bytes (checksum verified) plus its AsyncGridOut, whose
+    .metadata holds the "render" state for incremental rebuilds.
+    """
+    grid_out = await open_ppt_download_async(file_id)
+    data = b"".join([chunk async for chunk in iter_ppt_chunks_async(grid_out)])
+    return grid_out, data
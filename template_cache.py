@@ -0,0 +1,71 @@
+import hashlib
+import logging
+import os
+import threading
+from copy import deepcopy
+
+from pptx import Presentation
+
+# ------------------ Template Cache ------------------ #
+# Each template is parsed once per process and kept as a prototype.
+# Requests get a deepcopy of the prototype, which is several times cheaper
+# than unzipping and re-parsing the .pptx and fully isolated from other
+# requests. A template is reloaded when its file mtime changes.
+_templates = {}  # abs path -> (mtime_ns, prototype Presentation)
+_fingerprints = {}  # abs path -> (mtime_ns, sha256 of the file)
+_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _load_prototype(path, mtime_ns):
+    prs = Presentation(path)
+    _templates[path] = (mtime_ns, prs)
+    logger.info("Loaded template into cache: %s", path)
+    return prs
+
+
+def get_template(template_path):
+    """Return an isolated, ready-to-edit clone of the template."""
+    path = os.path.abspath(template_path)
+    mtime_ns = os.stat(path).st_mtime_ns
+
+    with _lock:
+        cached = _templates.get(path)
+        if cached and cached[0] == mtime_ns:
+            prototype = cached[1]
+        else:
+            prototype = _load_prototype(path, mtime_ns)
+        # lxml trees are not safe to walk from several threads at once,
+        # so the clone is taken while holding the lock.
+        return deepcopy(prototype)
+
+
+def preload_templates(template_paths):
+    """Parse templates ahead of time (e.g. at startup or in a worker initializer)."""
+    for template_path in template_paths:
+        path = os.path.abspath(template_path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with _lock:
+            cached = _templates.get(path)
+            if not cached or cached[0] != mtime_ns:
+                _load_prototype(path, mtime_ns)
+
+
+def template_fingerprint(template_path):
+    """sha256 of the template file; stable across machines, recomputed when the mtime changes."""
+    path = os.path.abspath(template_path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, "rb") as f:
+        fingerprint = hashlib.sha256(f.read()).hexdigest()
+    _fingerprints[path] = (mtime_ns, fingerprint)
+    return fingerprint
+
+
+def clear_template_cache():
+    with _lock:
+        _templates.clear()
+        _fingerprints.clear()
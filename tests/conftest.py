@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Root modules are imported as top-level modules, as the app does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep builds off the shared caches; must be set before pptgenerator is imported
+_cache_root = tempfile.mkdtemp(prefix="pptgen_tests_")
+os.environ.setdefault("IMAGE_CACHE_DIR", os.path.join(_cache_root, "images"))
+os.environ.setdefault("SLIDE_CACHE_DIR", os.path.join(_cache_root, "slides"))
@@ -0,0 +1,36 @@
+import json
+import os
+
+import pytest
+
+import build_pool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE = os.path.join(ROOT, "template_iamneo.pptx")
+
+
+@pytest.fixture
+def pool_of_two(monkeypatch):
+    monkeypatch.setattr(build_pool, "PPT_BUILD_PROCESSES", 2)
+    monkeypatch.setattr(build_pool, "PRELOAD_TEMPLATES", [TEMPLATE])
+    build_pool.shutdown_build_pool()
+    yield
+    build_pool.shutdown_build_pool()
+
+
+def _slides():
+    with open(os.path.join(ROOT, "slides.json"), encoding="utf-8") as f:
+        return [{k: v for k, v in slide.items() if k != "image_url"} for slide in json.load(f)["slides"]][:2]
+
+
+def test_warm_starts_every_worker(pool_of_two):
+    assert build_pool.warm_build_pool() == 2
+
+
+def test_broken_pool_is_recreated(pool_of_two):
+    pool, future = build_pool._submit(os._exit, 1)   # kills its worker
+    with pytest.raises(build_pool.BrokenProcessPool):
+        build_pool._result(pool, future)
+    result = build_pool.build_ppt_in_pool(TEMPLATE, _slides())
+    assert result["slides_count"] > 0
+    assert build_pool.get_build_pool() is not pool
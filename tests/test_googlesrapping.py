@@ -0,0 +1,59 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import googlesrapping
+from googlesrapping import ChromePool
+
+
+class FakeDriver:
+    def __init__(self, options=None):
+        self.options = options
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_pool_creates_headless_drivers(monkeypatch):
+    created = []
+    monkeypatch.setattr(googlesrapping.webdriver, "Chrome", lambda options: created.append(FakeDriver(options)) or created[-1])
+    pool = ChromePool(size=2)
+    pool.warm()
+    assert len(created) == 2
+    assert "--headless" in created[0].options.arguments
+    with pool.session() as driver:
+        assert driver in created
+
+
+def test_driver_start_failure_is_raised(monkeypatch):
+    def fail(options):
+        raise WebDriverException("chrome not found")
+    monkeypatch.setattr(googlesrapping.webdriver, "Chrome", fail)
+    pool = ChromePool(size=1)
+    with pytest.raises(WebDriverException):
+        pool.warm()
+    with pytest.raises(WebDriverException):
+        with pool.session():
+            pass
+    assert pool._created == 0
+
+
+def test_waiting_session_gets_a_replacement_for_a_recycled_browser(monkeypatch):
+    import threading
+    created = []
+    monkeypatch.setattr(googlesrapping.webdriver, "Chrome", lambda options: created.append(FakeDriver(options)) or created[-1])
+    pool = ChromePool(size=1, max_uses=1)
+    second_done = threading.Event()
+
+    def second_session():
+        with pool.session():
+            second_done.set()
+
+    with pool.session():
+        waiter = threading.Thread(target=second_session, daemon=True)
+        waiter.start()
+        assert not second_done.wait(0.1)   # at capacity: waits for the first browser
+    # The first browser hit max_uses and was discarded; the waiter must start a new one
+    assert second_done.wait(5)
+    waiter.join(5)
+    assert len(created) == 2 and created[0].quit_called and pool._created == 0
@@ -0,0 +1,20 @@
+from image_cache import ImageCache
+
+IMAGE = {"data": b"png-bytes", "width": 2, "height": 1, "format": "PNG"}
+
+
+def test_round_trip(tmp_path):
+    cache = ImageCache(cache_dir=str(tmp_path), max_bytes=1024)
+    cache.put("http://example.com/a.png", IMAGE)
+    assert cache.get("http://example.com/a.png") == IMAGE
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_unusable_directory_is_a_miss(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    cache = ImageCache(cache_dir=str(blocker / "ic"), max_bytes=1024)
+    assert cache.get("http://example.com/a.png") is None
+    cache.put("http://example.com/a.png", IMAGE)   # no exception
+    assert cache.get("http://example.com/a.png") is None
+    assert cache.stats()["misses"] == 2
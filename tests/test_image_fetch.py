@@ -0,0 +1,60 @@
+import os
+
+from pptx import Presentation
+
+import image_fetch
+from pptgenerator import compile_placeholder_index, replace_placeholders
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, body):
+        self.body = body
+
+    def iter_content(self, chunk_size):
+        for pos in range(0, len(self.body), chunk_size):
+            yield self.body[pos:pos + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, body):
+        self.body = body
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.body)
+
+
+def test_oversized_image_has_no_status(monkeypatch):
+    monkeypatch.setattr(image_fetch, "get_session", lambda: FakeSession(b"x" * 5000))
+    monkeypatch.setattr(image_fetch, "IMAGE_FETCH_MAX_BYTES", 1000)
+    fetched = image_fetch.fetch_image("http://example.com/big.png")
+    assert fetched["data"] is None
+    assert fetched["status"] is None
+    assert "larger than" in fetched["error"]
+
+
+def _image_run_text(fetched):
+    prs = Presentation(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "template_iamneo.pptx"))
+    slide = prs.slides[1]
+    url = "http://example.com/a.png"
+    replace_placeholders(slide, {"title": "t", "content": [], "image_url": url}, {url: fetched},
+                         placeholder_index=compile_placeholder_index(slide))
+    return [shape.text_frame.text for shape in slide.shapes if shape.has_text_frame]
+
+
+def test_aborted_fetch_leaves_slide_blank():
+    texts = _image_run_text({"data": None, "status": None, "error": "image larger than 1000 bytes"})
+    assert not any("status code" in text for text in texts)
+
+
+def test_http_error_status_is_shown():
+    texts = _image_run_text({"data": None, "status": 404, "error": "status code: 404"})
+    assert any("status code: 404" in text for text in texts)
@@ -0,0 +1,29 @@
+import os
+from io import BytesIO
+
+from PIL import Image
+
+import image_processing
+from image_cache import ImageCache
+from image_processing import EMU_PER_INCH, fit_image_to_box, normalize_image
+
+
+def _photo(size=(800, 600)):
+    img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    out = BytesIO()
+    img.save(out, format="PNG")
+    return normalize_image(out.getvalue())
+
+
+def test_cached_fit_records_the_encoded_format(tmp_path, monkeypatch):
+    cache = ImageCache(cache_dir=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(image_processing, "image_cache", cache)
+    image = _photo()
+    box = EMU_PER_INCH   # one inch at 150 dpi -> 150 px
+    fitted = fit_image_to_box(image, box, box, cache_key="http://example.com/photo.png")
+    assert fitted["bytes_after"] < fitted["bytes_before"]
+
+    entry = cache.get("http://example.com/photo.png#fit=150x150q85")
+    assert entry["data"] == fitted["data"]
+    assert entry["format"] == Image.open(BytesIO(entry["data"])).format == "JPEG"
+    assert (entry["width"], entry["height"]) == (150, 150)
@@ -0,0 +1,22 @@
+from llm_cache import create_llm_cache
+
+
+class UnreachableCollection:
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            raise ConnectionError("server selection timed out")
+        return call
+
+
+def test_unreachable_mongo_never_fails_a_generation():
+    cache = create_llm_cache({"llm_cache": UnreachableCollection()}, backend="mongo")
+    assert cache.get("key") is None
+    cache.set("key", [{"title": "A"}])   # no exception
+    stats = cache.stats()
+    assert stats["errors"] == 2 and stats["misses"] == 1 and stats["entries"] is None
+
+
+def test_unbuildable_mongo_backend_means_no_cache():
+    def get_db():
+        raise ConnectionError("bad MONGODB_URI")
+    assert create_llm_cache(get_db, backend="mongo") is None
@@ -0,0 +1,22 @@
+from llm_json import SlideStreamParser, extract_json_array
+
+OUTPUT = 'Here is the deck [see below], as requested [1]:\n```json\n[{"title": "A"}, {"title": "B [draft]"}]\n```'
+
+
+def _stream(text, size):
+    parser = SlideStreamParser()
+    slides = []
+    for i in range(0, len(text), size):
+        slides.extend(parser.feed(text[i:i + size]))
+    return parser, slides
+
+
+def test_stream_skips_bracketed_preamble():
+    for size in (1, 7, len(OUTPUT)):
+        parser, slides = _stream(OUTPUT, size)
+        assert parser.done and slides == extract_json_array(OUTPUT) == [{"title": "A"}, {"title": "B [draft]"}]
+
+
+def test_stream_accepts_empty_array():
+    parser, slides = _stream("[]", 1)
+    assert parser.done and slides == []
@@ -0,0 +1,49 @@
+import asyncio
+
+import ppt_generator_api
+from ppt_generator_api import SlideRequest, generate_slides_for_request
+
+
+class FakeCache:
+    def __init__(self):
+        self.stored = {}
+
+    def get(self, key):
+        return self.stored.get(key)
+
+    def set(self, key, value):
+        self.stored[key] = value
+
+
+def _run(monkeypatch, fail_slide_bodies):
+    cache = FakeCache()
+
+    async def fake_get_service(name):
+        return cache if name == "llm_cache" else None
+
+    async def fake_call_ai_system(model, prompt):
+        # The outline is requested first, slide bodies after it
+        if not fake_call_ai_system.outline_done:
+            fake_call_ai_system.outline_done = True
+            return [{"title": "Deck"}, {"title": "One"}, {"title": "Two"}]
+        if fail_slide_bodies:
+            raise ValueError("provider unavailable")
+        return [{"title": "Body", "content": ["text"]}]
+    fake_call_ai_system.outline_done = False
+
+    monkeypatch.setattr(ppt_generator_api, "get_service", fake_get_service)
+    monkeypatch.setattr(ppt_generator_api, "call_ai_system", fake_call_ai_system)
+    monkeypatch.setattr(ppt_generator_api, "LLM_SLIDE_RETRIES", 0)
+    request = SlideRequest(title="Topic", slides=2, model="groq", generation_mode="outline")
+    slides = asyncio.run(generate_slides_for_request(request))
+    return slides, cache
+
+
+def test_outline_deck_is_cached(monkeypatch):
+    slides, cache = _run(monkeypatch, fail_slide_bodies=False)
+    assert len(cache.stored) == 1
+
+
+def test_degraded_outline_deck_is_not_cached(monkeypatch):
+    slides, cache = _run(monkeypatch, fail_slide_bodies=True)
+    assert cache.stored == {}
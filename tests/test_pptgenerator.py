@@ -0,0 +1,119 @@
+import json
+import os
+import zipfile
+
+import pytest
+from pptx import Presentation
+
+from pptgenerator import build_ppt_to_stream, duplicate_slide, update_ppt_stream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _path(name):
+    return os.path.join(ROOT, name)
+
+
+def _slides(with_images=False):
+    with open(_path("slides.json"), encoding="utf-8") as f:
+        slides = json.load(f)["slides"]
+    if not with_images:
+        slides = [{k: v for k, v in slide.items() if k != "image_url"} for slide in slides]
+    return slides
+
+
+# ------------------ Templates ------------------ #
+@pytest.mark.parametrize("template", ["template_iamneo.pptx", "template_iamneo1.pptx"])
+def test_build_with_template(template):
+    result = build_ppt_to_stream(_path(template), _slides())
+    prs = Presentation(result["stream"])
+    assert len(prs.slides) == result["slides_count"] > 0
+
+
+def test_duplicate_slide_keeps_svg_media():
+    prs = Presentation(_path("template_iamneo1.pptx"))
+    source = prs.slides[1]
+    copy = duplicate_slide(prs, source)
+    source_parts = {rel.target_part for rel in source.part.rels.values() if not rel.is_external}
+    copy_parts = {rel.target_part for rel in copy.part.rels.values() if not rel.is_external}
+    # Same package: the copy shares the template's media parts, SVG included
+    assert any(part.content_type == "image/svg+xml" for part in copy_parts)
+    assert {p for p in copy_parts if p.content_type.startswith("image/")} == \
+        {p for p in source_parts if p.content_type.startswith("image/")}
+
+
+def test_update_with_template_iamneo1():
+    template = _path("template_iamneo1.pptx")
+    slides = _slides()
+    built = build_ppt_to_stream(template, slides)
+    edited = [dict(slide) for slide in slides]
+    edited[1]["title"] = edited[1]["title"] + " (edited)"
+    updated = update_ppt_stream(template, built["stream"].getvalue(), built["render_state"], edited)
+    assert updated["slides_count"] == Presentation(updated["stream"]).slides.__len__()
+    assert updated["reused_slides"] > 0
+
+
+# ------------------ Slide Cache ------------------ #
+def _png_data_url():
+    import base64
+    from io import BytesIO
+    from PIL import Image
+    buf = BytesIO()
+    Image.new("RGB", (8, 6), "red").save(buf, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+@pytest.mark.parametrize("template", ["template_iamneo.pptx", "template_iamneo1.pptx"])
+def test_cached_build_has_same_content_hash(template, tmp_path, monkeypatch):
+    import pptgenerator
+    from slide_cache import SlideCache
+    from storage import deck_content_hash
+
+    cache = SlideCache(cache_dir=str(tmp_path))
+    monkeypatch.setattr(pptgenerator, "slide_cache", cache)
+    slides = _slides()
+    slides[1]["image_url"] = _png_data_url()
+    slides[-1]["image_url"] = _png_data_url()
+
+    cold = build_ppt_to_stream(_path(template), slides)
+    warm = build_ppt_to_stream(_path(template), slides)
+    assert warm["slide_cache"]["hits"] > 0 and warm["slide_cache"]["misses"] == 0
+    cold_names = zipfile.ZipFile(cold["stream"]).namelist()
+    assert zipfile.ZipFile(warm["stream"]).namelist() == cold_names
+    assert deck_content_hash(cold["stream"]) == deck_content_hash(warm["stream"])
+
+
+# ------------------ Slide Planning ------------------ #
+def test_legacy_chunk_helpers_keep_their_contract():
+    from pptgenerator import chunk_content, split_code_into_chunks
+    content = [{"text": "x" * 400, "subpoints": []}, "y" * 300, {"text": "z" * 100, "subpoints": ["w" * 50]}]
+    assert chunk_content(content, max_chars=600) == [content[:1], content[1:]]
+    code = "\n".join(f"line {n}" for n in range(30))
+    chunks = split_code_into_chunks(code, max_lines=25)
+    assert [len(chunk.splitlines()) for chunk in chunks] == [25, 5]
+
+
+def test_fit_chunks_stay_within_the_box():
+    from pptgenerator import content_groups, fit_content_chunks
+    from text_layout import DEFAULT_TEXT_LAYOUT as layout
+    content = [{"text": "word " * 40, "subpoints": ["sub " * 20]} for _ in range(12)]
+    chunks, image_fits = fit_content_chunks(content, with_image=True)
+    assert len(chunks) > 1 and image_fits
+    for chunk in chunks[:-1]:
+        assert sum(layout.measure_groups(content_groups(chunk))) <= layout.content_height - layout.lead_height
+    assert sum(layout.measure_groups(content_groups(chunks[-1]))) <= layout.image_content_height - layout.lead_height
+
+
+def test_filled_text_boxes_do_not_grow():
+    from pptx.enum.text import MSO_AUTO_SIZE
+    from pptgenerator import fill_code, fill_content
+    slide = Presentation().slides.add_slide(Presentation().slide_layouts[6])
+    content_box = slide.shapes.add_textbox(0, 0, 100, 100)
+    content_box.text_frame.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
+    fill_content(content_box.text_frame, ["one", {"text": "two", "subpoints": ["three"]}])
+    code_box = slide.shapes.add_textbox(0, 0, 100, 100)
+    code_box.text_frame.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
+    code_box.text_frame.text = "{code}"
+    fill_code(code_box, code_box.text_frame.paragraphs[0].runs[0], {"code": "print(1)"})
+    assert content_box.text_frame.auto_size == MSO_AUTO_SIZE.NONE
+    assert code_box.text_frame.auto_size == MSO_AUTO_SIZE.NONE
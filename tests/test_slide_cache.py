@@ -0,0 +1,25 @@
+from slide_cache import SlideCache
+
+ENTRY = {"xml": b"<p:sld/>", "notes": None, "rels": [
+    {"rId": "rId2", "reltype": "image", "blob": b"png", "content_type": "image/png", "ext": "png"},
+]}
+
+
+def test_round_trip(tmp_path):
+    cache = SlideCache(cache_dir=str(tmp_path), memory_bytes=1024, disk_bytes=4096)
+    key = cache.key_for("a" * 64, "render-key")
+    cache.put(key, ENTRY)
+    assert cache.get(key) == ENTRY
+    # A fresh instance finds it on disk
+    assert SlideCache(cache_dir=str(tmp_path)).get(key) == ENTRY
+
+
+def test_unusable_directory_degrades_to_misses(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    cache = SlideCache(cache_dir=str(blocker / "sc"))
+    key = cache.key_for("a" * 64, "render-key")
+    assert cache.get(key) is None
+    cache.put(key, ENTRY)   # no exception
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["skipped_puts"] == 1
@@ -0,0 +1,32 @@
+from io import BytesIO
+
+from bson import ObjectId
+
+import storage
+
+
+class FakeFiles:
+    def __init__(self, existing):
+        self.existing = existing
+
+    def find_one(self, query, projection=None):
+        return self.existing
+
+    def update_one(self, query, update):
+        pass
+
+
+class FakeDb:
+    def __init__(self, existing):
+        self.fs = type("FS", (), {"files": FakeFiles(existing)})()
+
+
+def test_deduplicated_store_reports_the_stored_file(monkeypatch):
+    existing = {"_id": ObjectId(), "length": 1234, "filename": "First_Request.pptx"}
+    monkeypatch.setattr(storage, "get_db", lambda: FakeDb(existing))
+    monkeypatch.setattr(storage, "_ensure_dedup_index", lambda: None)
+    monkeypatch.setattr(storage, "_content_hash_for", lambda source: "same-content")
+
+    stored = storage.store_ppt_record(BytesIO(b"deck"), "Second_Request.pptx")
+    assert stored == {"ppt_id": existing["_id"], "filename": "First_Request.pptx", "deduplicated": True}
+    assert storage.store_ppt_in_mongodb(BytesIO(b"deck"), "Second_Request.pptx") == existing["_id"]
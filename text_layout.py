@@ -0,0 +1,229 @@
+import unicodedata
+from functools import lru_cache
+
+# ------------------ Text Fit Layout ------------------ #
+# Measures how tall bullets and code really are once word-wrapped in their
+# text box, so slide planning can split content by height instead of by
+# character count. Widths come from per-font glyph tables (no font files
+# or rendering needed); lengths are in EMU like everything else in pptx.
+EMU_PER_PT = 12700
+
+
+class FontMetrics:
+    """Advance widths of printable ASCII in font units, plus the font's line height (in ems)."""
+
+    def __init__(self, name, ascii_widths, units_per_em=2048, line_height=1.2, bold_factor=1.0):
+        assert len(ascii_widths) == 95, name
+        self.name = name
+        self.ascii_widths = ascii_widths
+        self.units_per_em = units_per_em
+        self.line_height = line_height
+        self.bold_factor = bold_factor
+        lowercase = ascii_widths[ord("a") - 32:ord("z") - 31]
+        self.average = sum(lowercase) / len(lowercase)
+
+    def units(self, ch):
+        code = ord(ch)
+        if 32 <= code < 127:
+            return self.ascii_widths[code - 32]
+        if code < 32:
+            return self.ascii_widths[0]   # tabs and stray control characters: a space
+        if unicodedata.east_asian_width(ch) in ("W", "F"):
+            return self.units_per_em
+        base = unicodedata.normalize("NFD", ch)[0]
+        if base != ch and ord(base) < 127:
+            return self.units(base)   # accented Latin letters are as wide as their base letter
+        return self.average
+
+
+# hmtx advance widths (2048 units/em) for " " through "~".
+# Line heights are (winAscent + winDescent) / unitsPerEm, which PowerPoint uses for single spacing.
+CALIBRI = FontMetrics(
+    "Calibri",
+    (
+        463, 546, 821, 1038, 1038, 1471, 1407, 452, 621, 621, 1038, 1038, 511, 627, 517, 791,  # space - /
+        1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038, 1038,                          # 0 - 9
+        548, 548, 1038, 1038, 1038, 949, 1825,                                               # : - @
+        1185, 1114, 1092, 1260, 1000, 941, 1292, 1276, 516, 653, 1064, 861, 1751,            # A - M
+        1322, 1356, 1058, 1378, 1112, 941, 998, 1314, 1162, 1822, 1063, 998, 959,            # N - Z
+        627, 791, 627, 1038, 1038, 585,                                                      # [ - `
+        981, 1076, 866, 1076, 1019, 625, 964, 1076, 470, 490, 931, 470, 1636,                # a - m
+        1076, 1080, 1076, 1076, 714, 801, 686, 1076, 925, 1464, 887, 927, 809,               # n - z
+        640, 943, 640, 1038,                                                                 # { - ~
+    ),
+    line_height=2500 / 2048,
+    bold_factor=1.025,   # Calibri Bold runs about 2.5% wider
+)
+CONSOLAS = FontMetrics("Consolas", (1126,) * 95, line_height=2398 / 2048)
+FONTS = {font.name: font for font in (CALIBRI, CONSOLAS)}
+
+
+@lru_cache(maxsize=None)
+def glyph_table(font_name, size_pt, bold=False):
+    """EMU advance widths of code points 0-255 for a font at a size; built once per (font, size, weight)."""
+    font = FONTS[font_name]
+    scale = size_pt * EMU_PER_PT / font.units_per_em * (font.bold_factor if bold else 1.0)
+    return tuple(round(font.units(chr(code)) * scale) for code in range(256))
+
+
+class TextMeasurer:
+    """
+    Word-wraps paragraphs in one font and size. Word widths are memoized,
+    so measuring a whole deck in one batch mostly costs dict lookups.
+    """
+
+    def __init__(self, font_name, size_pt, line_spacing=1.0):
+        self.font = FONTS[font_name]
+        self.size_pt = size_pt
+        self.line_height = round(self.font.line_height * size_pt * EMU_PER_PT * line_spacing)
+        self._tables = {False: glyph_table(font_name, size_pt), True: glyph_table(font_name, size_pt, True)}
+        self.space = self._tables[False][32]
+        self._words = {False: {}, True: {}}
+
+    def word_width(self, word, bold=False):
+        width = self._words[bold].get(word)
+        if width is None:
+            table = self._tables[bold]
+            scale = self.size_pt * EMU_PER_PT / self.font.units_per_em * (self.font.bold_factor if bold else 1.0)
+            width = sum(table[c] if c < 256 else round(self.font.units(chr(c)) * scale) for c in map(ord, word))
+            self._words[bold][word] = width
+        return width
+
+    def word_widths(self, segments):
+        """Widths of the space-separated words of a paragraph given as (text, bold) segments."""
+        widths = []
+        for text, bold in segments:
+            memo = self._words[bold]
+            words = [memo.get(word) or self.word_width(word, bold) for word in text.split(" ")]
+            if widths:
+                widths[-1] += words.pop(0)   # segment boundary inside a word, e.g. "**bold**text"
+            widths.extend(words)
+        return widths
+
+    def count_lines(self, widths, line_width):
+        """Lines a paragraph wraps to: greedy word wrap, over-long words broken across lines."""
+        lines, x = 1, 0
+        for width in widths:
+            if x and x + self.space + width <= line_width:
+                x += self.space + width
+                continue
+            if x:
+                lines += 1
+            if width > line_width:
+                extra, x = divmod(width, line_width)
+                lines += extra - (0 if x else 1)
+                x = x or line_width
+            else:
+                x = width
+        return lines
+
+
+class TextFitLayout:
+    """
+    Text geometry of a template, in EMU: the bullet box (its line width,
+    per-level indents and the height available down to the footer, or down
+    to the picture when the slide has one) and the code box.
+    """
+
+    def __init__(self, content_width, content_height, image_content_height, level_indents,
+                 code_width, code_height, lead_height=0, bullet_font=("Calibri", 22),
+                 bullet_space_after=0, code_font=("Consolas", 14)):
+        self.content_width = content_width
+        self.content_height = content_height
+        self.image_content_height = image_content_height
+        self.level_indents = level_indents
+        self.code_width = code_width
+        self.code_height = code_height
+        self.lead_height = lead_height
+        self.bullet_font = bullet_font
+        self.bullet_space_after = bullet_space_after
+        self.code_font = code_font
+
+    def line_width(self, level):
+        return self.content_width - self.level_indents.get(level, self.level_indents.get(max(self.level_indents), 0))
+
+    # ------------------ Batched Measurement ------------------ #
+    def measure_groups(self, groups):
+        """
+        Heights of bullet groups (a bullet and its subpoints), each given as
+        [(segments, level), ...] with segments [(text, bold), ...]. Pass every
+        group of a deck at once: the wrap widths and word memo are shared.
+        """
+        measurer = TextMeasurer(*self.bullet_font)
+        line_widths = {}
+        paragraph_extra = self.bullet_space_after
+        heights = []
+        for paragraphs in groups:
+            height = 0
+            for segments, level in paragraphs:
+                line_width = line_widths.get(level)
+                if line_width is None:
+                    line_width = line_widths[level] = self.line_width(level)
+                height += measurer.count_lines(measurer.word_widths(segments), line_width) * measurer.line_height
+                height += paragraph_extra
+            heights.append(height)
+        return heights
+
+    def code_line_counts(self, lines):
+        """Wrapped line count of each code line (leading spaces count: code keeps its indentation)."""
+        measurer = TextMeasurer(*self.code_font)
+        char_width = measurer.space   # Consolas is monospaced
+        per_line = max(1, self.code_width // char_width)
+        return [max(1, -(-len(line.expandtabs(4)) // per_line)) for line in lines], measurer.line_height
+
+    # ------------------ Splitting ------------------ #
+    def pack(self, heights, max_height):
+        """Greedily cut consecutive heights into [start, end) chunks that fit max_height (a taller item gets its own)."""
+        chunks, start, used = [], 0, 0
+        for idx, height in enumerate(heights):
+            if idx > start and used + height > max_height:
+                chunks.append((start, idx))
+                start, used = idx, 0
+            used += height
+        if heights:
+            chunks.append((start, len(heights)))
+        return chunks
+
+    def split_content(self, heights, with_image=False):
+        """
+        Chunks of bullet groups per slide, and whether the picture fits on the
+        last one (below its text). When the forward split leaves too much text
+        for the picture, the last slide takes only what fits above it and the
+        rest is packed before, which costs at most one extra slide. The picture
+        is left out only when even the last group alone is too tall for it.
+        Returns ([(start, end), ...], image_fits).
+        """
+        budget = self.content_height - self.lead_height
+        chunks = self.pack(heights, budget)
+        if not with_image:
+            return chunks, False
+        image_budget = self.image_content_height - self.lead_height
+        if not chunks or sum(heights[chunks[-1][0]:]) <= image_budget:
+            return chunks, True
+
+        # Fill the last slide from the end up to the picture budget, pack the rest forward
+        tail_start, used = len(heights), 0
+        while tail_start > 0 and used + heights[tail_start - 1] <= image_budget:
+            tail_start -= 1
+            used += heights[tail_start]
+        if tail_start == len(heights):
+            return chunks, False
+        return self.pack(heights[:tail_start], budget) + [(tail_start, len(heights))], True
+
+    def split_code(self, lines):
+        """[start, end) ranges of code lines per slide, by wrapped height."""
+        counts, line_height = self.code_line_counts(lines)
+        return self.pack([count * line_height for count in counts], self.code_height)
+
+
+# Geometry of template_iamneo.pptx, for callers that plan without a template
+DEFAULT_TEXT_LAYOUT = TextFitLayout(
+    content_width=11403160,
+    content_height=6462305,
+    image_content_height=3158712,
+    level_indents={0: 0, 1: 457200},
+    code_width=10769843,
+    code_height=5577520,
+    lead_height=418579,   # the empty 18pt paragraph at 150% line spacing above the bullets
+    bullet_space_after=63500,
+)